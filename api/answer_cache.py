@@ -0,0 +1,92 @@
+"""In-process answer cache for repeated questions.
+
+Exact tier: keyed by (document id, content version, normalized question).
+Semantic tier (opt-in, ``ANSWER_CACHE_SEMANTIC=1``): reuses the question
+embedding computed for retrieval and returns a cached answer whose question
+is at least ``ANSWER_CACHE_SIMILARITY`` cosine-similar, for the same
+document version.
+Both tiers use TTL + LRU eviction, so bumping ``Document.version`` on
+re-index naturally retires stale answers.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+from cachetools import TTLCache
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "10000"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "0") == "1"
+# Sentence embeddings barely move for a swapped entity or an added "not":
+# "Who signed the 2021 lease?" and "Who signed the 2022 lease?" can score
+# above 0.95, so a semantic hit may hand back the answer to a different
+# question. Off by default; raise the threshold if you turn it on.
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", question.lower())).strip()
+
+
+def is_cacheable(answer):
+    """Don't cache the wrapper's error strings."""
+    return bool(answer) and not answer.startswith(("⚠️", "❌"))
+
+
+class AnswerCache:
+    def __init__(self, maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 semantic=ANSWER_CACHE_SEMANTIC, threshold=ANSWER_CACHE_SIMILARITY):
+        self.semantic = semantic
+        self.threshold = threshold
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)  # (doc, version, question) -> (answer, vector)
+        self._by_document = {}  # (doc, version) -> set of entry keys, pruned lazily
+        self._lock = threading.Lock()
+
+    def get(self, document_id, version, question, embedding=None):
+        """Return ``(answer, "exact" | "semantic")`` or ``(None, None)``."""
+        key = (document_id, version, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0], "exact"
+            if not (self.semantic and embedding is not None):
+                return None, None
+
+            live = [k for k in self._by_document.get(key[:2], ()) if k in self._entries]
+            self._by_document[key[:2]] = set(live)
+            candidates = [(k, self._entries[k]) for k in live if self._entries[k][1] is not None]
+        if not candidates:
+            return None, None
+
+        vectors = np.stack([vector for _, (_, vector) in candidates])
+        scores = vectors @ np.asarray(embedding, dtype=np.float32)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None, None
+        with self._lock:
+            self._entries.get(candidates[best][0])  # refresh LRU position
+        return candidates[best][1][0], "semantic"
+
+    def put(self, document_id, version, question, answer, embedding=None):
+        if not is_cacheable(answer):
+            return
+        key = (document_id, version, normalize_question(question))
+        vector = np.asarray(embedding, dtype=np.float32) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = (answer, vector)
+            group = {k for k in self._by_document.get(key[:2], ()) if k in self._entries}
+            group.add(key)
+            self._by_document[key[:2]] = group
+
+    def invalidate(self, document_id):
+        with self._lock:
+            for group in [g for g in self._by_document if g[0] == document_id]:
+                for key in self._by_document.pop(group):
+                    self._entries.pop(key, None)
+
+
+answer_cache = AnswerCache()
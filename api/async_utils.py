@@ -0,0 +1,83 @@
+"""Building blocks for the async (ASGI) views.
+
+DRF's APIView is sync-only, so async endpoints are plain Django views that
+authenticate the JWT themselves. Blocking work (embedding, vector search)
+is pushed to a bounded thread pool so the event loop stays free while many
+LLM calls are in flight. Each call on the pool is bracketed by
+``close_old_connections()``, as Django does around a request, so the pool
+threads' DB connections are health-checked, expire after ``CONN_MAX_AGE``
+and go back to the connection pool.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", str(min(8, os.cpu_count() or 1))))
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=CPU_POOL_SIZE, thread_name_prefix="cpu")
+    return _pool
+
+
+def _call_with_fresh_connections(fn, *args, **kwargs):
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call (ORM work included) on the bounded CPU pool and await its result."""
+    loop = asyncio.get_running_loop()
+    # carry contextvars over (like asyncio.to_thread) so trace spans nest under the request
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _call_with_fresh_connections, fn, *args, **kwargs)
+    return await loop.run_in_executor(_get_pool(), call)
+
+
+async def authenticate_jwt(request):
+    """Resolve the JWT user for a plain Django request, or None."""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    return result[0] if result else None
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """Async class-based view with JWT auth; all handlers must be ``async def``."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await authenticate_jwt(request)
+        if user is None:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+    @staticmethod
+    def parse_json(request):
+        """Return the decoded JSON body, or None if it is malformed."""
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
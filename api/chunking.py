@@ -0,0 +1,218 @@
+"""Chunking strategies.
+
+Every strategy is a generator over page texts that yields chunk dicts
+``{"text", "page", "start", "end"}``. Offsets index into the pages joined
+with ``PAGE_SEPARATOR`` (the extracted text) and ``page`` is the 1-based
+page the chunk starts on. Pages are consumed one at a time and only the text
+still needed by pending chunks is buffered, so a long document never has to
+exist as one string.
+
+* ``token``     – sentences packed up to ``CHUNK_TOKENS`` embedding-tokenizer
+                  tokens, with ``CHUNK_OVERLAP_TOKENS`` of overlap
+* ``structure`` – page- and heading-aware: chunks never cross a page break or
+                  a heading; paragraphs are packed up to ``CHUNK_TOKENS``
+* ``sentence``  – sliding windows of ``CHUNK_SENTENCES`` sentences that step
+                  forward ``CHUNK_SENTENCES - CHUNK_SENTENCE_OVERLAP`` at a time,
+                  closed early at ``CHUNK_TOKENS``
+
+Pick one with ``CHUNK_STRATEGY``; changing it changes chunk hashes, so the
+next ``POST /api/documents/<id>/reindex/`` of each document re-embeds it.
+"""
+import math
+import os
+import re
+from collections import deque, namedtuple
+
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "token")
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "240"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "24"))
+CHUNK_SENTENCES = int(os.getenv("CHUNK_SENTENCES", "5"))
+CHUNK_SENTENCE_OVERLAP = int(os.getenv("CHUNK_SENTENCE_OVERLAP", "1"))
+
+PAGE_SEPARATOR = "\n"
+
+# A sentence runs to terminal punctuation followed by whitespace, a blank line, or the end of the page.
+# Single newlines (hard-wrapped PDF lines) do not end a sentence.
+_SENTENCE_RE = re.compile(r"\S.*?(?:[.!?][\"')\]]*(?=\s)|(?=\n[ \t]*\n)|\Z)", re.S)
+_LINE_RE = re.compile(r"[^\n]+")
+_HEADING_RE = re.compile(
+    r"#{1,6}\s+\S.*"  # markdown
+    r"|(?:\d+(?:\.\d+)*\.?|[IVXLC]+\.|Chapter|Section|Article|Part|Appendix)\s+[A-Z0-9].*"  # numbered
+    r"|[A-Z][A-Z0-9 ,&'()/:-]{2,}"  # ALL CAPS
+)
+HEADING_MAX_CHARS = 80
+
+Unit = namedtuple("Unit", "page start end tokens hard_break")
+
+
+def is_heading(line):
+    line = line.strip()
+    if not 2 <= len(line) <= HEADING_MAX_CHARS:
+        return False
+    if line.startswith("#"):
+        return bool(_HEADING_RE.fullmatch(line))
+    return not line.endswith((".", ",", ";")) and bool(_HEADING_RE.fullmatch(line))
+
+
+class _Window:
+    """Rolling view of the joined document text, trimmed as chunks are emitted."""
+
+    def __init__(self):
+        self.base = 0  # document offset of self.text[0]
+        self.text = ""
+
+    def feed(self, pages):
+        """Append pages one at a time; yields ``(page_no, page_start, page_text)``."""
+        for page_no, page in enumerate(pages, 1):
+            if page_no > 1:
+                self.text += PAGE_SEPARATOR
+            page_start = self.base + len(self.text)
+            self.text += page
+            yield page_no, page_start, page
+
+    def slice(self, start, end):
+        return self.text[start - self.base:end - self.base]
+
+    def trim(self, keep_from):
+        if keep_from > self.base:
+            self.text = self.text[keep_from - self.base:]
+            self.base = keep_from
+
+
+def _fit(text, start, end, count, budget):
+    """Yield ``(start, end, tokens)`` pieces of ``text[start:end]``, split at whitespace to fit ``budget``."""
+    tokens = count(text[start:end])
+    if tokens <= budget:
+        yield start, end, tokens
+        return
+    pieces = math.ceil(tokens / budget)
+    step = (end - start) / pieces
+    cut_from = start
+    for i in range(1, pieces):
+        target = int(start + i * step)
+        space = text.rfind(" ", cut_from + 1, target + 1)
+        cut = space if space > cut_from else target
+        yield from _fit(text, cut_from, cut, count, budget)
+        cut_from = cut + 1 if text[cut:cut + 1] == " " else cut
+    yield from _fit(text, cut_from, end, count, budget)
+
+
+def _sentence_units(window, pages, count, budget):
+    for page_no, page_start, text in window.feed(pages):
+        for m in _SENTENCE_RE.finditer(text):
+            for s, e, tokens in _fit(text, m.start(), m.end(), count, budget):
+                yield Unit(page_no, page_start + s, page_start + e, tokens, False)
+
+
+def _block_units(window, pages, count, budget):
+    """Paragraph blocks; each page start and heading is a hard break."""
+    for page_no, page_start, text in window.feed(pages):
+        blocks = []  # [start, end, heading]
+        open_block = False  # whether the next text line continues blocks[-1]
+        for m in _LINE_RE.finditer(text):
+            line = m.group()
+            if not line.strip():
+                open_block = False
+            elif is_heading(line):
+                blocks.append([m.start(), m.end(), True])
+                open_block = False
+            elif open_block and text.count("\n", blocks[-1][1], m.start()) < 2:
+                blocks[-1][1] = m.end()
+            else:
+                blocks.append([m.start(), m.end(), False])
+                open_block = True
+
+        for i, (bs, be, heading) in enumerate(blocks):
+            hard_break = heading or i == 0
+            tokens = count(text[bs:be])
+            if tokens <= budget:
+                yield Unit(page_no, page_start + bs, page_start + be, tokens, hard_break)
+                continue
+            for m in _SENTENCE_RE.finditer(text, bs, be):
+                for s, e, t in _fit(text, m.start(), min(m.end(), be), count, budget):
+                    yield Unit(page_no, page_start + s, page_start + e, t, hard_break)
+                    hard_break = False
+
+
+def _emit(window, units):
+    first, last = units[0], units[-1]
+    return {
+        "text": window.slice(first.start, last.end),
+        "page": first.page,
+        "start": first.start,
+        "end": last.end,
+    }
+
+
+def _pack(window, units, budget, overlap):
+    pending, total = deque(), 0
+    for unit in units:
+        if pending and (unit.hard_break or total + unit.tokens > budget):
+            yield _emit(window, pending)
+            if unit.hard_break:
+                pending.clear()
+            # carry trailing units (at most ``overlap`` tokens) into the next chunk
+            total = sum(u.tokens for u in pending)
+            while pending and (total > overlap or total + unit.tokens > budget):
+                total -= pending.popleft().tokens
+            window.trim(pending[0].start if pending else unit.start)
+        pending.append(unit)
+        total += unit.tokens
+    if pending:
+        yield _emit(window, pending)
+
+
+def token_chunks(pages, count, budget=CHUNK_TOKENS, overlap=CHUNK_OVERLAP_TOKENS):
+    window = _Window()
+    yield from _pack(window, _sentence_units(window, pages, count, budget), budget, overlap)
+
+
+def structure_chunks(pages, count, budget=CHUNK_TOKENS, overlap=CHUNK_OVERLAP_TOKENS):
+    window = _Window()
+    yield from _pack(window, _block_units(window, pages, count, budget), budget, overlap)
+
+
+def sentence_chunks(pages, count, budget=CHUNK_TOKENS, size=CHUNK_SENTENCES, overlap=CHUNK_SENTENCE_OVERLAP):
+    window = _Window()
+    size = max(size, 1)
+    step = max(size - overlap, 1)
+    pending, total, since_emit = deque(), 0, 0
+    for unit in _sentence_units(window, pages, count, budget):
+        if pending and total + unit.tokens > budget:
+            # long sentences: close the window early rather than exceed the token budget
+            if since_emit:
+                yield _emit(window, pending)
+                since_emit = 0
+            while pending and total + unit.tokens > budget:
+                total -= pending.popleft().tokens
+            window.trim(pending[0].start if pending else unit.start)
+        pending.append(unit)
+        total += unit.tokens
+        since_emit += 1
+        if len(pending) == size:
+            yield _emit(window, pending)
+            since_emit = 0
+            for _ in range(step):
+                total -= pending.popleft().tokens
+            window.trim(pending[0].start if pending else unit.end)
+    if pending and since_emit:
+        yield _emit(window, pending)
+
+
+STRATEGIES = {
+    "token": token_chunks,
+    "structure": structure_chunks,
+    "sentence": sentence_chunks,
+}
+
+
+def chunk_pages(pages, strategy=None, count=None, **options):
+    """Chunk an iterable of page texts with the named (or configured) strategy."""
+    strategy = strategy or CHUNK_STRATEGY
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy {strategy!r}; use one of {sorted(STRATEGIES)}")
+    if count is None:
+        from .embeddings import get_embedding_service
+
+        count = get_embedding_service().count_tokens
+    yield from STRATEGIES[strategy](pages, count, **options)
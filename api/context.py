@@ -0,0 +1,130 @@
+"""Prompt context assembly: the stage between retrieval and generation.
+
+Retrieved chunks overlap (chunking keeps some overlap) and neighbours from
+the same page are often retrieved together. Before prompting we:
+
+1. merge hits whose character spans overlap or touch, and neighbouring
+   chunks of the same page, so no text is paid for twice;
+2. rank the merged blocks by their best retrieval score and pack them into
+   ``CONTEXT_TOKENS``, trimming the last block at a sentence/word boundary;
+3. emit the kept blocks per document in reading order.
+
+Tokens are counted with the embedding tokenizer, which tracks the LLM's
+count closely enough for budgeting.
+"""
+import os
+import re
+
+CONTEXT_TOKENS = int(os.getenv("CONTEXT_TOKENS", "1200"))
+# how many chunks to retrieve before packing
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "8"))
+# don't bother adding a trimmed block smaller than this
+MIN_BLOCK_TOKENS = 40
+
+_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s|\n")
+
+
+def _merge(a, b):
+    """Union of two hits from the same document, ``b`` starting at or after ``a``."""
+    if b["start"] <= a["end"]:
+        text = a["text"] + b["text"][a["end"] - b["start"]:]
+    else:
+        text = a["text"] + "\n" + b["text"]
+    return {
+        **a,
+        "text": text,
+        "end": max(a["end"], b["end"]),
+        "score": max(a["score"], b["score"]),
+        "positions": a["positions"] + b["positions"],
+    }
+
+
+def merge_hits(hits):
+    """Collapse overlapping/adjacent spans into blocks ``{"document_id", "text", "page", "start", "end", "score"}``."""
+    blocks, by_document = [], {}
+    seen_texts = set()
+    for h in hits:
+        if h.get("start") is None or h.get("end") is None:
+            # legacy chunk without offsets: only exact duplicates can be dropped
+            if h["text"] not in seen_texts:
+                seen_texts.add(h["text"])
+                blocks.append({**h, "positions": [h.get("position")]})
+            continue
+        by_document.setdefault(h["document_id"], []).append({**h, "positions": [h.get("position")]})
+
+    for spans in by_document.values():
+        spans.sort(key=lambda h: h["start"])
+        current = spans[0]
+        for span in spans[1:]:
+            adjacent = (
+                span["page"] == current["page"]
+                and span["positions"][0] is not None
+                and span["positions"][0] - 1 in current["positions"]
+            )
+            if span["start"] <= current["end"] or adjacent:
+                current = _merge(current, span)
+            else:
+                blocks.append(current)
+                current = span
+        blocks.append(current)
+    return blocks
+
+
+def _trim(text, count, budget):
+    """Longest prefix of ``text`` within ``budget`` tokens that ends at a sentence or word boundary."""
+    cut = int(len(text) * budget / max(count(text), 1))
+    while cut > 0:
+        head = text[:cut + 1]  # include the character at the cut, so a boundary right there counts
+        boundary = max((m.start() for m in _BOUNDARY_RE.finditer(head)), default=-1)
+        if boundary <= 0:
+            boundary = head.rfind(" ")
+        head = head[:boundary] if boundary > 0 else head
+        if count(head) <= budget:
+            return head.rstrip()
+        cut = int(len(head) * 0.9)
+    return ""
+
+
+def pack(blocks, budget=CONTEXT_TOKENS, count=None):
+    """Best-scoring blocks that fit in ``budget`` tokens; the last one may be trimmed."""
+    if count is None:
+        from .embeddings import get_embedding_service
+
+        count = get_embedding_service().count_tokens
+    kept, used = [], 0
+    for block in sorted(blocks, key=lambda b: -b["score"]):
+        remaining = budget - used
+        if remaining < MIN_BLOCK_TOKENS:
+            break
+        tokens = count(block["text"])
+        if tokens > remaining:
+            text = _trim(block["text"], count, remaining)
+            if not text:
+                continue
+            block = {**block, "text": text, "trimmed": True}
+            tokens = count(text)
+        kept.append({**block, "tokens": tokens})
+        used += tokens
+    return kept
+
+
+def assemble_context(hits, budget=CONTEXT_TOKENS, labels=None, count=None):
+    """Deduplicate, pack and format retrieved hits; returns ``(context, blocks)``.
+
+    ``labels`` maps document ids to a heading (e.g. the title) shown above
+    that document's blocks, for multi-document prompts.
+    """
+    blocks = pack(merge_hits(hits), budget, count)
+    # group per document (best document first), then reading order inside it
+    best = {}
+    for b in blocks:
+        best[b["document_id"]] = max(best.get(b["document_id"], 0.0), b["score"])
+    blocks.sort(key=lambda b: (-best[b["document_id"]], b["document_id"], b.get("start") or 0))
+
+    parts, current = [], object()
+    for b in blocks:
+        if labels is not None and b["document_id"] != current:
+            current = b["document_id"]
+            parts.append(f"[{labels.get(current, current)}]")
+        parts.append(b["text"])
+    return "\n\n".join(parts), blocks
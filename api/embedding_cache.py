@@ -0,0 +1,121 @@
+"""Persistent embedding cache.
+
+Vectors are stored in a local SQLite file as raw float32 blobs, keyed by a
+128-bit xxHash of ``model name + chunk text``. The cache is bounded by
+``EMBEDDING_CACHE_MAX_MB`` and evicts the least recently used entries.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import xxhash
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") == "1"
+
+# SQLite caps host parameters per statement; stay well under it.
+_SQL_BATCH = 500
+# eviction trims to this share of the budget, so the next writes don't have to
+EVICT_TO = 0.9
+
+
+def cache_key(model_name, text):
+    return xxhash.xxh3_128_digest(f"{model_name}\0{text}".encode("utf-8"))
+
+
+class EmbeddingCache:
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_mb=EMBEDDING_CACHE_MAX_MB):
+        self.path = str(path)
+        self.max_bytes = max_mb * 1024 * 1024
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._rows = None  # upper bound on the row count; recounted only when it crosses the budget
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys that are cached, and mark them used."""
+        found = {}
+        conn = self._conn()
+        for start in range(0, len(keys), _SQL_BATCH):
+            batch = keys[start:start + _SQL_BATCH]
+            marks = ",".join("?" * len(batch))
+            rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", batch)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+
+        if found:
+            now = time.time_ns()
+            with self._write_lock, conn:
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs and evict the oldest entries if over budget."""
+        if not items:
+            return
+        now = time.time_ns()
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(k, np.asarray(v, dtype=np.float32).tobytes(), now) for k, v in items],
+            )
+            self._evict(conn, len(items), len(items[0][1]) * 4 + 16)
+
+    def _evict(self, conn, added, entry_bytes):
+        max_entries = max(1, self.max_bytes // entry_bytes)
+        if self._rows is not None:
+            self._rows += added  # replaced keys and other writers' rows make this approximate
+            if self._rows <= max_entries:
+                return
+        (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > max_entries:
+            keep = max(1, int(max_entries * EVICT_TO))
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (count - keep,),
+            )
+            count = keep
+        self._rows = count
+
+    def clear(self):
+        with self._write_lock, self._conn() as conn:
+            conn.execute("DELETE FROM embeddings")
+            self._rows = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Return the process-wide cache, or None when EMBEDDING_CACHE=0."""
+    global _cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
@@ -0,0 +1,174 @@
+"""Shared embedding service.
+
+One lazily-loaded model per process, used by both ingestion and retrieval.
+Texts are encoded in batches straight to float32 NumPy arrays. Two backends:
+
+* ``torch``  – sentence-transformers (the model HuggingFaceEmbeddings wraps)
+* ``onnx``   – ONNX Runtime on CPU with the model's exported ``onnx/model.onnx``
+"""
+import os
+import re
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .embedding_cache import cache_key, get_embedding_cache
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH")  # optional local model.onnx
+EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", "256"))
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = let ORT decide
+
+# word pieces and punctuation; only used if a backend exposes no tokenizer
+_ROUGH_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class _TorchBackend:
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.tokenizer = self.model.tokenizer
+
+    def encode(self, texts):
+        return self.model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+
+
+class _OnnxBackend:
+    def __init__(self, model_name):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        model_path = EMBEDDING_ONNX_PATH or hf_hub_download(model_name, "onnx/model.onnx")
+        self.tokenizer = Tokenizer.from_pretrained(model_name)
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+
+        opts = ort.SessionOptions()
+        if ONNX_THREADS:
+            opts.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts):
+        encoded = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+
+        hidden = self.session.run(None, feeds)[0]
+        # mean pooling over real tokens, then L2-normalize (matches sentence-transformers)
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+
+_BACKENDS = {"torch": _TorchBackend, "onnx": _OnnxBackend}
+
+
+class EmbeddingService(Embeddings):
+    """Batched encoder that also satisfies LangChain's ``Embeddings`` interface."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, backend=EMBEDDING_BACKEND, batch_size=EMBED_BATCH_SIZE):
+        if backend not in _BACKENDS:
+            raise ValueError(f"Unknown embedding backend {backend!r}; use one of {sorted(_BACKENDS)}")
+        self.model_name = model_name
+        self.backend_name = backend
+        self.batch_size = batch_size
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    print(f"🧠 Loading embedding model {self.model_name} ({self.backend_name})")
+                    self._backend = _BACKENDS[self.backend_name](self.model_name)
+        return self._backend
+
+    @property
+    def tokenizer(self):
+        return self.backend.tokenizer
+
+    def count_tokens(self, text):
+        """Model tokens in ``text`` (without special tokens), ignoring truncation."""
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return len(_ROUGH_TOKEN_RE.findall(text))
+        encoded = tokenizer.encode(text, add_special_tokens=False)
+        ids = getattr(encoded, "ids", encoded)  # tokenizers.Encoding vs transformers list
+        return len(ids) + sum(len(o.ids) for o in getattr(encoded, "overflowing", ()))
+
+    def encode(self, texts, batch_size=None):
+        """Encode texts to an (n, dim) float32 array of unit vectors."""
+        batch_size = batch_size or self.batch_size
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = [
+            self.backend.encode(list(texts[start:start + batch_size]))
+            for start in range(0, len(texts), batch_size)
+        ]
+        return np.vstack(batches).astype(np.float32, copy=False)
+
+    def encode_cached(self, texts, on_batch=None):
+        """Like ``encode`` but only embeds texts missing from the embedding cache.
+
+        Returns ``(vectors, hits)``; ``on_batch(done, total)`` reports progress
+        over the texts that actually had to be embedded.
+        """
+        cache = get_embedding_cache()
+        keys = [cache_key(self.model_name, t) for t in texts]
+        found = cache.get_many(list(set(keys))) if cache else {}
+        hits = sum(1 for k in keys if k in found)
+
+        # embed each distinct missing text once, even if it repeats in this call
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        miss_keys, miss_texts = list(missing), list(missing.values())
+        for start in range(0, len(miss_texts), self.batch_size):
+            vectors = self.encode(miss_texts[start:start + self.batch_size])
+            batch = list(zip(miss_keys[start:start + self.batch_size], vectors))
+            found.update(batch)
+            if cache:
+                cache.put_many(batch)
+            if on_batch:
+                on_batch(min(start + self.batch_size, len(miss_texts)), len(miss_texts))
+
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32), 0
+        return np.vstack([found[k] for k in keys]), hits
+
+    def embed_documents(self, texts):
+        return self.encode_cached(texts)[0].tolist()
+
+    def embed_query(self, text):
+        return self.encode([text])[0].tolist()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    """Return the process-wide embedding service (the model loads on first use)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService()
+    return _service
@@ -0,0 +1,232 @@
+"""Page-level text extraction on a process pool.
+
+Each page is tried with PyMuPDF, then pdfplumber, and only pages that still
+have no text are rasterized and OCR'd, one page at a time. Pages are streamed
+back in order with a bounded number in flight, so peak memory depends on the
+pool size rather than on the page count. All readers in a process share one
+memory map of the file (``SharedFile``).
+"""
+import hashlib
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import fitz
+import pdfplumber
+import pytesseract
+from PIL import Image
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+MIN_PAGE_CHARS = int(os.getenv("MIN_PAGE_CHARS", "20"))
+# seconds a pool worker keeps its last file mapped after its last page
+WORKER_FILE_IDLE = float(os.getenv("EXTRACT_WORKER_FILE_IDLE", "2"))
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tiff")
+
+_pool = None
+
+
+class SharedFile:
+    """One read-only memory map of a file, reused by every extraction stage.
+
+    PyMuPDF, pdfplumber, PIL, the text reader and the content hash all read
+    from the same mapping, so the file is never read into process memory and
+    pages only come in from the OS page cache as they are touched. Worker
+    processes map the same file, so they share those cached pages too.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        stat = os.fstat(self._file.fileno())
+        self.identity = _identity(stat)
+        size = stat.st_size
+        self.map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self.map) if self.map is not None else memoryview(b"")
+        self._fitz = None
+        self._plumber = None
+
+    @property
+    def size(self):
+        return len(self._view)
+
+    def sha256(self):
+        return hashlib.sha256(self._view).hexdigest()
+
+    def fitz(self):
+        if self._fitz is None:
+            self._fitz = fitz.open(stream=self._view, filetype="pdf")
+        return self._fitz
+
+    def plumber(self):
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(self.map)
+        return self._plumber
+
+    def image(self):
+        return Image.open(self.map)
+
+    def text(self):
+        return bytes(self._view).decode("utf-8")
+
+    def close(self):
+        for handle in (self._fitz, self._plumber):
+            if handle is not None:
+                handle.close()
+        self._fitz = self._plumber = None
+        self._view.release()
+        if self.map is not None:
+            self.map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _identity(stat):
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+# Worker processes run one page at a time; keep their current file mapped
+# between pages so each worker maps a file once, not once per page. The
+# mapping is dropped when a different (or replaced) file arrives and after
+# WORKER_FILE_IDLE seconds without a page, so idle workers don't pin deleted
+# uploads.
+_worker_file = None
+_worker_timer = None
+_worker_lock = threading.Lock()
+
+
+def _release_worker_file():
+    global _worker_file
+    with _worker_lock:
+        if _worker_file is not None:
+            _worker_file.close()
+            _worker_file = None
+
+
+@contextmanager
+def _worker_shared(path):
+    global _worker_file, _worker_timer
+    with _worker_lock:
+        if _worker_timer is not None:
+            _worker_timer.cancel()
+        if _worker_file is None or _worker_file.path != path or _worker_file.identity != _identity(os.stat(path)):
+            if _worker_file is not None:
+                _worker_file.close()
+                _worker_file = None
+            _worker_file = SharedFile(path)
+        try:
+            yield _worker_file
+        finally:
+            _worker_timer = threading.Timer(WORKER_FILE_IDLE, _release_worker_file)
+            _worker_timer.daemon = True
+            _worker_timer.start()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that may be holding DB connections or threads
+        _pool = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def ocr_image(img):
+    try:
+        return pytesseract.image_to_string(img)
+    except Exception as e:
+        print("⚠️ OCR error:", e)
+        return ""
+
+
+def extract_page(path, page_no, shared=None):
+    """Extract one PDF page: PyMuPDF → pdfplumber → OCR. Returns (page_no, text, method)."""
+    if shared is None:  # in a pool worker
+        with _worker_shared(path) as shared:
+            return _extract_page(shared, page_no)
+    return _extract_page(shared, page_no)
+
+
+def _extract_page(shared, page_no):
+    page = shared.fitz()[page_no]
+
+    text = page.get_text() or ""
+    if len(text.strip()) >= MIN_PAGE_CHARS:
+        return page_no, text, "pymupdf"
+
+    try:
+        plumber_text = shared.plumber().pages[page_no].extract_text() or ""
+        if len(plumber_text.strip()) >= MIN_PAGE_CHARS:
+            return page_no, plumber_text, "pdfplumber"
+    except Exception as e:
+        print(f"⚠️ pdfplumber failed on page {page_no}:", e)
+
+    pix = page.get_pixmap(dpi=OCR_DPI)
+    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    del pix
+    ocr_text = ocr_image(img)
+    return page_no, (ocr_text if ocr_text.strip() else text), "ocr"
+
+
+def iter_pdf_pages(path, workers=None, shared=None):
+    """Yield (page_no, text, method) for every page in order."""
+    if shared is None:
+        with SharedFile(path) as shared:
+            yield from iter_pdf_pages(path, workers, shared)
+        return
+
+    total = shared.fitz().page_count
+    workers = EXTRACT_WORKERS if workers is None else workers
+
+    if workers <= 1 or total <= 2:
+        for page_no in range(total):
+            yield extract_page(path, page_no, shared)
+        return
+
+    pool = _get_pool()
+    window = workers * 2
+    pending = {}
+    next_submit = 0
+    for page_no in range(total):
+        while next_submit < total and next_submit < page_no + window:
+            pending[next_submit] = pool.submit(extract_page, path, next_submit)
+            next_submit += 1
+        yield pending.pop(page_no).result()
+
+
+def iter_pages(path, workers=None, shared=None):
+    """Yield (page_no, text, method) for a PDF, image or plain-text file.
+
+    Pass an open ``SharedFile`` to reuse its mapping (e.g. one already hashed).
+    """
+    if shared is None:
+        with SharedFile(path) as shared:
+            yield from iter_pages(path, workers, shared)
+        return
+
+    lower = path.lower()
+    if lower.endswith(".pdf"):
+        yield from iter_pdf_pages(path, workers, shared)
+    elif lower.endswith(IMAGE_EXTENSIONS):
+        try:
+            text = ocr_image(shared.image())
+        except Exception as e:
+            print("⚠️ Image open error:", e)
+            text = ""
+        yield 0, text, "ocr"
+    else:
+        try:
+            text = shared.text()
+        except Exception as e:
+            print("⚠️ Text extract error:", e)
+            text = ""
+        yield 0, text, "text"
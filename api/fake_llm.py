@@ -0,0 +1,89 @@
+"""Local stand-in for the Gemini REST API, for tests and benchmarks.
+
+Speaks just enough of ``generateContent`` / ``streamGenerateContent`` for
+the google-generativeai SDK's REST transport. Latency, per-model outages and
+random errors are configurable so the model router can be exercised offline.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATH_RE = re.compile(r"^/v1beta/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)")
+
+
+def make_handler(latency, model_latency, fail_models, error_rate, tokens):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _candidate(self, text, finished):
+            return {
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"text": text}]},
+                    "finishReason": 1 if finished else 0,  # STOP (clients ask for int enums)
+                    "index": 0,
+                }],
+            }
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            match = PATH_RE.match(self.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if not match:
+                return self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+            model = match["model"]
+            if model in fail_models or random.random() < error_rate:
+                return self._send_json(500, {"error": {"code": 500, "message": f"{model} unavailable"}})
+
+            prompt_chars = len(body)
+            words = [f"tok{i}" for i in range(tokens)]
+            delay = model_latency.get(model, latency)
+
+            if match["method"] == "generateContent":
+                time.sleep(delay)
+                payload = self._candidate(f"[{model}] " + " ".join(words), True)
+                payload["usageMetadata"] = {"promptTokenCount": prompt_chars // 4, "candidatesTokenCount": tokens}
+                return self._send_json(200, payload)
+
+            # streamGenerateContent: a JSON array written element by element
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = [f"[{model}] "] + [w + " " for w in words]
+            for i, piece in enumerate(pieces):
+                time.sleep(delay / len(pieces))
+                prefix = "[" if i == 0 else ","
+                chunk = (prefix + json.dumps(self._candidate(piece, i == len(pieces) - 1))).encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b"1\r\n]\r\n0\r\n\r\n")
+
+    return Handler
+
+
+def make_server(host="127.0.0.1", port=8765, latency=0.2, model_latency=None, fail_models=(),
+                error_rate=0.0, tokens=40):
+    handler = make_handler(latency, model_latency or {}, set(fail_models), error_rate, tokens)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_in_thread(**kwargs):
+    """Start a server on a daemon thread; returns (server, base_url). Use port=0 for any free port."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
@@ -1,29 +1,316 @@
+"""Gemini access through a small model router.
+
+Models are tried fastest-healthy-first instead of in a fixed order:
+
+* each model has its own timeout (``GEMINI_TIMEOUT`` / ``GEMINI_MODEL_TIMEOUTS``)
+* a circuit breaker skips a model for ``GEMINI_BREAKER_COOLDOWN`` seconds after
+  ``GEMINI_BREAKER_THRESHOLD`` consecutive failures
+* ``GenerativeModel`` clients are built once and reused
+* latency and error rate are tracked as moving averages and used for ordering;
+  the error rate decays with a ``GEMINI_ERROR_HALF_LIFE`` so old failures fade
+* every ``GEMINI_PROBE_INTERVAL`` seconds one request is routed to a model that
+  has been passed over (half-open probe), so a demoted model can win back traffic
+
+Set ``GEMINI_API_ENDPOINT`` (e.g. ``http://127.0.0.1:8765``) to talk to a local
+fake server such as ``manage.py fake_llm_server`` over REST.
+"""
+import asyncio
 import os
+import threading
+import time
+
 import google.generativeai as genai
 from dotenv import load_dotenv
 
 load_dotenv()
 
 API_KEY = os.getenv("GEMINI_API_KEY")
-if API_KEY:
-    genai.configure(api_key=API_KEY)
-else:
-    print("⚠️ GEMINI_API_KEY not set")
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT")
+
+
+MODELS = os.getenv("GEMINI_MODELS", "gemini-2.5-flash,gemini-2.5-pro,gemini-1.5-pro").split(",")
+DEFAULT_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+# "gemini-2.5-flash=15,gemini-2.5-pro=45"
+MODEL_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, seconds in (
+        item.split("=") for item in os.getenv("GEMINI_MODEL_TIMEOUTS", "").split(",") if "=" in item
+    )
+}
+BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))
+ERROR_HALF_LIFE = float(os.getenv("GEMINI_ERROR_HALF_LIFE", "120"))
+PROBE_INTERVAL = float(os.getenv("GEMINI_PROBE_INTERVAL", "60"))
+EWMA_ALPHA = 0.2
+
+NO_KEY_MESSAGE = "⚠️ GEMINI_API_KEY not set in environment."
+FAILED_MESSAGE = "❌ Gemini failed to generate a response."
+
+
+class StreamInterrupted(Exception):
+    """A model failed after part of the answer had already been streamed."""
+
+
+class ModelHealth:
+    """Rolling latency / error stats and breaker state for one model."""
+
+    def __init__(self, name, rank, now):
+        self.name = name
+        self.rank = rank
+        self.latency = None  # EWMA seconds of successful calls
+        self.error_rate = 0.0  # EWMA of failures (0..1), decayed over time
+        self.decayed_at = now
+        self.last_attempt = now
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.calls = 0
+        self.errors = 0
+
+    def is_open(self, now):
+        return now < self.open_until
+
+    def decay(self, now, half_life):
+        if half_life > 0:
+            self.error_rate *= 0.5 ** ((now - self.decayed_at) / half_life)
+        self.decayed_at = now
+
+    def sort_key(self):
+        # Untried models keep their configured preference until measured.
+        if self.latency is None:
+            return (1, 0.0, self.rank)
+        return (0, self.latency / max(1.0 - self.error_rate, 0.1), self.rank)
+
+    def snapshot(self, now):
+        return {
+            "model": self.name,
+            "latency_ewma": self.latency,
+            "error_rate_ewma": round(self.error_rate, 4),
+            "calls": self.calls,
+            "errors": self.errors,
+            "circuit_open": self.is_open(now),
+        }
+
+
+class ModelRouter:
+    def __init__(self, models=MODELS, timeouts=MODEL_TIMEOUTS, default_timeout=DEFAULT_TIMEOUT,
+                 threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, half_life=ERROR_HALF_LIFE,
+                 probe_interval=PROBE_INTERVAL, clock=time.monotonic):
+        self.clock = clock
+        now = clock()
+        self.health = {name: ModelHealth(name, rank, now) for rank, name in enumerate(models)}
+        self.timeouts = timeouts
+        self.default_timeout = default_timeout
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.half_life = half_life
+        self.probe_interval = probe_interval
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, name):
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = genai.GenerativeModel(name)
+            return self._clients[name]
+
+    def timeout(self, name):
+        return self.timeouts.get(name, self.default_timeout)
+
+    def candidates(self):
+        """Healthy models, fastest first; if every breaker is open, the one closest to reopening.
+
+        A healthy model that hasn't been tried for ``probe_interval`` seconds is
+        moved to the front for this one call, so it gets re-measured.
+        """
+        now = self.clock()
+        with self._lock:
+            for h in self.health.values():
+                h.decay(now, self.half_life)
+            healthy = [h for h in self.health.values() if not h.is_open(now)]
+            if not healthy:
+                healthy = [min(self.health.values(), key=lambda h: h.open_until)]
+            ordered = sorted(healthy, key=ModelHealth.sort_key)
+            stale = [h for h in ordered[1:] if now - h.last_attempt >= self.probe_interval]
+            if stale:
+                probe = min(stale, key=lambda h: h.last_attempt)
+                probe.last_attempt = now  # one probe per interval, not one per concurrent request
+                ordered.remove(probe)
+                ordered.insert(0, probe)
+            return [h.name for h in ordered]
+
+    def record_success(self, name, latency):
+        with self._lock:
+            h = self.health[name]
+            h.decay(self.clock(), self.half_life)
+            h.last_attempt = h.decayed_at
+            h.calls += 1
+            h.consecutive_failures = 0
+            h.open_until = 0.0
+            h.latency = latency if h.latency is None else (1 - EWMA_ALPHA) * h.latency + EWMA_ALPHA * latency
+            h.error_rate *= 1 - EWMA_ALPHA
+
+    def record_failure(self, name, error):
+        print(f"⚠️ Model {name} failed: {error!r}")
+        with self._lock:
+            h = self.health[name]
+            h.decay(self.clock(), self.half_life)
+            h.last_attempt = h.decayed_at
+            h.calls += 1
+            h.errors += 1
+            h.consecutive_failures += 1
+            h.error_rate = (1 - EWMA_ALPHA) * h.error_rate + EWMA_ALPHA
+            if h.consecutive_failures >= self.threshold:
+                h.open_until = h.decayed_at + self.cooldown
+
+    def snapshot(self):
+        now = self.clock()
+        with self._lock:
+            for h in self.health.values():
+                h.decay(now, self.half_life)
+            return [h.snapshot(now) for h in self.health.values()]
+
+    def generate(self, prompt):
+        for name in self.candidates():
+            started = time.monotonic()
+            try:
+                response = self.client(name).generate_content(
+                    prompt, request_options={"timeout": self.timeout(name)}
+                )
+                text = response.text
+            except Exception as e:
+                self.record_failure(name, e)
+                continue
+            if text:
+                self.record_success(name, time.monotonic() - started)
+                return text.strip()
+            self.record_failure(name, "empty response")
+        return FAILED_MESSAGE
+
+    async def agenerate(self, prompt):
+        for name in self.candidates():
+            started = time.monotonic()
+            timeout = self.timeout(name)
+            try:
+                if GEMINI_TRANSPORT == "rest":
+                    # the SDK's REST "async" path blocks; keep it off the event loop
+                    call = asyncio.to_thread(
+                        self.client(name).generate_content, prompt, request_options={"timeout": timeout}
+                    )
+                else:
+                    call = self.client(name).generate_content_async(prompt)
+                response = await asyncio.wait_for(call, timeout)
+                text = response.text
+            except Exception as e:
+                self.record_failure(name, e)
+                continue
+            if text:
+                self.record_success(name, time.monotonic() - started)
+                return text.strip()
+            self.record_failure(name, "empty response")
+        return FAILED_MESSAGE
+
+    async def astream(self, prompt):
+        """Yield text pieces; fall through to another model only before the first piece.
+
+        Raises ``StreamInterrupted`` if the model fails once output has been
+        yielded, so callers never mistake a truncated answer for a full one.
+        """
+        for name in self.candidates():
+            started = time.monotonic()
+            timeout = self.timeout(name)
+            produced = False
+            try:
+                async for text in self._stream_one(name, prompt, timeout):
+                    produced = True
+                    yield text
+            except Exception as e:
+                self.record_failure(name, e)
+                if produced:
+                    raise StreamInterrupted(f"{name} failed mid-stream: {e!r}") from e
+                continue
+            if produced:
+                self.record_success(name, time.monotonic() - started)
+                return
+            self.record_failure(name, "empty response")
+        yield FAILED_MESSAGE
+
+    async def _stream_one(self, name, prompt, timeout):
+        model = self.client(name)
+        if GEMINI_TRANSPORT == "rest":
+            response = await asyncio.to_thread(
+                model.generate_content, prompt, stream=True, request_options={"timeout": timeout}
+            )
+            chunks = iter(response)
+            while True:
+                chunk = await asyncio.wait_for(asyncio.to_thread(next, chunks, None), timeout)
+                if chunk is None:
+                    return
+                text = _chunk_text(chunk)
+                if text:
+                    yield text
+        else:
+            response = await asyncio.wait_for(model.generate_content_async(prompt, stream=True), timeout)
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                except StopAsyncIteration:
+                    return
+                text = _chunk_text(chunk)
+                if text:
+                    yield text
+
+
+def _chunk_text(chunk):
+    try:
+        return chunk.text
+    except ValueError:  # chunk carried no text part (e.g. safety block)
+        return ""
+
+
+router = ModelRouter()
+
+
+def configure(api_key, endpoint=None, transport=None):
+    """(Re)point the SDK at Gemini or a compatible endpoint, e.g. ``api.fake_llm`` in benchmarks."""
+    global API_KEY, GEMINI_TRANSPORT
+    API_KEY = api_key
+    GEMINI_TRANSPORT = transport or ("rest" if endpoint else None)
+    if not api_key:
+        print("⚠️ GEMINI_API_KEY not set")
+        return
+    options = {}
+    if GEMINI_TRANSPORT:
+        options["transport"] = GEMINI_TRANSPORT
+    if endpoint:
+        options["client_options"] = {"api_endpoint": endpoint}
+    genai.configure(api_key=api_key, **options)
+    with router._lock:
+        router._clients.clear()
+
+
+configure(API_KEY, GEMINI_API_ENDPOINT, GEMINI_TRANSPORT)
 
 
 def generate_answer(prompt: str):
-    """Generate text using Gemini 2.5 family."""
+    """Generate text using the fastest healthy Gemini model."""
+    if not API_KEY:
+        return NO_KEY_MESSAGE
+    return router.generate(prompt)
+
+
+async def agenerate_answer(prompt: str):
+    """Async ``generate_answer``: awaits Gemini without holding a thread."""
+    if not API_KEY:
+        return NO_KEY_MESSAGE
+    return await router.agenerate(prompt)
+
+
+async def astream_answer(prompt: str):
+    """Yield answer text pieces as Gemini streams them (may raise ``StreamInterrupted``)."""
     if not API_KEY:
-        return "⚠️ GEMINI_API_KEY not set in environment."
-
-    for model_name in ["gemini-2.5-flash", "gemini-2.5-pro", "gemini-1.5-pro"]:
-        try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
-            if hasattr(response, "text") and response.text:
-                return response.text.strip()
-        except Exception as e:
-            print(f"⚠️ Model {model_name} failed: {e}")
-            continue
-
-    return "❌ Gemini failed to generate a response."
+        yield NO_KEY_MESSAGE
+        return
+    async for text in router.astream(prompt):
+        yield text
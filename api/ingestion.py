@@ -0,0 +1,291 @@
+"""Background ingestion queue.
+
+Jobs live in the ``IngestionJob`` table, so the default SQLite database is the
+queue: no external broker is needed. Uploads enqueue a job and return
+immediately; jobs run on an in-process thread pool (``INGEST_INLINE``) and/or
+in a separate ``manage.py ingest_worker`` process that drains whatever is
+still queued.
+
+Jobs enqueued together with ``enqueue_batch`` share one ``batch`` id and run
+as a unit: each document is extracted and chunked on its own, then the new
+chunks of all of them are embedded in the same model batches.
+"""
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import IngestionJob
+from .answer_cache import answer_cache
+from .chunking import CHUNK_STRATEGY, PAGE_SEPARATOR
+from .extraction import SharedFile
+from .rag_utils import (
+    embed_chunks,
+    extract_pages,
+    persist_chunks,
+    plan_reindex,
+    split_pages,
+)
+from .telemetry import span
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.INGEST_WORKERS, thread_name_prefix="ingest"
+        )
+    return _executor
+
+
+def enqueue_ingestion(document, file_hash="", force=False):
+    """Create a queued job for ``document`` and schedule it after commit.
+
+    Pass ``file_hash`` when it is already known (streamed uploads) so the
+    job doesn't hash the file again. ``force`` re-chunks the document even
+    if its file is unchanged, e.g. after a new ``CHUNK_STRATEGY``.
+    """
+    job = IngestionJob.objects.create(
+        document=document,
+        file_hash=file_hash or "",
+        force=force,
+        progress={stage: {"status": "pending"} for stage in IngestionJob.STAGES},
+    )
+    if settings.INGEST_INLINE:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job.id))
+    return job
+
+
+def enqueue_batch(documents, file_hashes=None):
+    """Queue one job per document under a shared batch id; returns ``(batch, jobs)``."""
+    batch = uuid.uuid4().hex
+    file_hashes = file_hashes or {}
+    jobs = IngestionJob.objects.bulk_create(
+        IngestionJob(
+            document=doc,
+            batch=batch,
+            file_hash=file_hashes.get(doc.id) or "",
+            progress={stage: {"status": "pending"} for stage in IngestionJob.STAGES},
+        )
+        for doc in documents
+    )
+    if settings.INGEST_INLINE and jobs:
+        job_ids = [job.id for job in jobs]
+        transaction.on_commit(lambda: _get_executor().submit(_run_batch_in_thread, job_ids))
+    return batch, jobs
+
+
+def claim_job(job_id):
+    """Atomically move a job from queued to running; False if someone else got it."""
+    return bool(
+        IngestionJob.objects.filter(id=job_id, status=IngestionJob.QUEUED).update(
+            status=IngestionJob.RUNNING, started_at=timezone.now()
+        )
+    )
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def _run_batch_in_thread(job_ids):
+    close_old_connections()
+    try:
+        run_batch(job_ids)
+    finally:
+        close_old_connections()
+
+
+def _finish(job, error=None):
+    if error is not None:
+        if job.stage:
+            job.progress.setdefault(job.stage, {})["status"] = "failed"
+        job.status = IngestionJob.FAILED
+        job.error = str(error)
+    else:
+        job.status = IngestionJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "progress", "error", "finished_at"])
+
+
+def run_job(job_id):
+    """Claim and execute one ingestion job. Returns True if it ran."""
+    if not claim_job(job_id):
+        return False
+
+    job = IngestionJob.objects.select_related("document").get(id=job_id)
+    try:
+        with span("ingest.job", document_id=job.document_id, job_id=job.id):
+            _run_pipeline(job)
+    except Exception as e:
+        traceback.print_exc()
+        _finish(job, e)
+    else:
+        _finish(job)
+    return True
+
+
+def run_batch(job_ids):
+    """Claim and execute jobs together, sharing the embed stage. Returns the number that ran.
+
+    A failure in one document's extract, chunk or persist stage fails only
+    that job; an embedding failure fails every job still in the batch.
+    """
+    claimed = [job_id for job_id in job_ids if claim_job(job_id)]
+    jobs = IngestionJob.objects.select_related("document").filter(id__in=claimed).order_by("id")
+
+    with span("ingest.batch", jobs=len(claimed)):
+        planned = []
+        for job in jobs:
+            try:
+                with span("ingest.job", document_id=job.document_id, job_id=job.id):
+                    plan = _prepare(job)
+            except Exception as e:
+                traceback.print_exc()
+                _finish(job, e)
+                continue
+            if plan is None:
+                _finish(job)
+            else:
+                planned.append((job, plan))
+
+        try:
+            vectors = _embed([job for job, _ in planned], [plan["fresh"] for _, plan in planned])
+        except Exception as e:
+            traceback.print_exc()
+            for job, _ in planned:
+                _finish(job, e)
+            return len(claimed)
+
+        for (job, plan), job_vectors in zip(planned, vectors):
+            try:
+                with span("ingest.job", document_id=job.document_id, job_id=job.id):
+                    _persist(job, plan, job_vectors)
+            except Exception as e:
+                traceback.print_exc()
+                _finish(job, e)
+            else:
+                _finish(job)
+    return len(claimed)
+
+
+@contextmanager
+def _stage(job, name):
+    job.stage = name
+    job.progress[name] = {"status": "running"}
+    job.save(update_fields=["stage", "progress"])
+    started = time.perf_counter()
+    with span(f"ingest.{name}", document_id=job.document_id):
+        yield job.progress[name]
+    job.progress[name]["status"] = "done"
+    job.progress[name]["seconds"] = round(time.perf_counter() - started, 3)
+    job.save(update_fields=["progress"])
+
+
+def _skip_remaining(job, after):
+    for name in IngestionJob.STAGES[IngestionJob.STAGES.index(after) + 1:]:
+        job.progress[name] = {"status": "skipped"}
+
+
+def _run_pipeline(job):
+    plan = _prepare(job)
+    if plan is not None:
+        [vectors] = _embed([job], [plan["fresh"]])
+        _persist(job, plan, vectors)
+
+
+def _prepare(job):
+    """Extract and chunk stages; returns the plan for embedding and persisting, or None if unchanged."""
+    doc = job.document
+
+    with _stage(job, "extract") as p, SharedFile(doc.file.path) as shared:
+        # one memory map serves the hash and every extractor; opened inside
+        # the stage so a missing or unreadable file fails "extract"
+        file_hash = job.file_hash or shared.sha256()
+        if file_hash == doc.file_hash and doc.version and not job.force:
+            p["unchanged"] = True
+        else:
+            p.update(pages=0, ocr_pages=0)
+
+            def on_page(page_no, method):
+                p["pages"] += 1
+                if method == "ocr":
+                    p["ocr_pages"] += 1
+                if p["pages"] % 10 == 0:
+                    job.save(update_fields=["progress"])
+
+            pages = extract_pages(doc.file.path, on_page=on_page, shared=shared)
+            p["characters"] = sum(map(len, pages)) + len(PAGE_SEPARATOR) * max(len(pages) - 1, 0)
+
+    if p.get("unchanged"):
+        _skip_remaining(job, "extract")
+        print(f"✅ Job {job.id}: document {doc.id} unchanged (same file hash), nothing to re-index")
+        return None
+
+    with _stage(job, "chunk") as p:
+        # pages stream into the chunker and are released as they are consumed,
+        # so the document never exists as one joined string
+        chunks, fresh, kept, stale_ids = plan_reindex(doc, split_pages(pages))
+        p.update(
+            strategy=CHUNK_STRATEGY, chunks=len(chunks), new=len(fresh), unchanged=len(kept), stale=len(stale_ids)
+        )
+    return {"file_hash": file_hash, "chunks": chunks, "fresh": fresh, "kept": kept, "stale_ids": stale_ids}
+
+
+def _embed(jobs, fresh_lists):
+    """Embed stage for one or more jobs at once; returns one vector array per job."""
+    texts = [c["text"] for fresh in fresh_lists for c in fresh]
+    with ExitStack() as stack:
+        stages = [stack.enter_context(_stage(job, "embed")) for job in jobs]
+        for p in stages:
+            p.update(done=0, total=len(texts))
+            if len(jobs) > 1:
+                p["shared_with"] = len(jobs) - 1
+
+        def on_batch(done, total):
+            for job, p in zip(jobs, stages):
+                p.update(done=done, total=total)
+                job.save(update_fields=["progress"])
+
+        vectors, hits = embed_chunks(texts, on_batch=on_batch)
+        for p in stages:
+            p.update(done=len(texts), total=len(texts), cache_hits=hits)
+            p["cache_hit_rate"] = round(hits / len(texts), 3) if texts else 0.0
+
+    split, start = [], 0
+    for fresh in fresh_lists:
+        split.append(vectors[start:start + len(fresh)])
+        start += len(fresh)
+    return split
+
+
+def _persist(job, plan, vectors):
+    doc = job.document
+    chunks, fresh, stale_ids = plan["chunks"], plan["fresh"], plan["stale_ids"]
+
+    with _stage(job, "persist") as p:
+        persist_chunks(doc, chunks, fresh, vectors, plan["kept"], stale_ids)
+        doc.text = None  # chunk rows hold the text; the column only serves documents indexed before them
+        doc.file_hash = plan["file_hash"]
+        if fresh or stale_ids or not doc.version:
+            doc.version += 1
+            answer_cache.invalidate(doc.id)
+        doc.save(update_fields=["text", "file_hash", "version"])
+        p["chunks"] = len(chunks)
+
+    print(
+        f"✅ Job {job.id}: indexed {len(chunks)} chunks for document {doc.id} "
+        f"({len(fresh)} embedded, {len(stale_ids)} removed, "
+        f"embedding cache hit rate {job.progress['embed']['cache_hit_rate']:.0%})"
+    )
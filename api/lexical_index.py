@@ -0,0 +1,233 @@
+"""On-disk inverted index with BM25 scoring.
+
+Built over chunks at ingest time and kept in a local SQLite file. Postings
+are stored one row per (term, document) with the (chunk number, term
+frequency) pairs packed into a uint32 blob, so adding or deleting a
+document touches only that document's rows. Document frequencies and
+corpus length are kept up to date incrementally for IDF and length
+normalization.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "lexical_index.sqlite3")
+BM25_K1 = 1.2
+BM25_B = 0.75
+CHUNK_LOOKUP_BATCH = 400  # (document_id, chunk_no) pairs per query, under SQLite's variable limit
+
+# Keeps identifiers like "PART-4411", "7.2.1" or "ISO_9001" as single tokens.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_SPLIT_RE = re.compile(r"[-_./]")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was were "
+    "what when where which who why will with does do did can".split()
+)
+
+
+def tokenize(text):
+    """Lowercased terms; compound identifiers also emit their parts."""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if _SPLIT_RE.search(token):
+            terms.extend(p for p in _SPLIT_RE.split(token) if p and p not in STOPWORDS)
+    return terms
+
+
+def _pack(pairs):
+    return array("I", [v for pair in pairs for v in pair]).tobytes()
+
+
+def _unpack(blob):
+    values = array("I")
+    values.frombytes(blob)
+    return zip(values[0::2], values[1::2])
+
+
+class LexicalIndex:
+    def __init__(self, path=LEXICAL_INDEX_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._conn() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    document_id INTEGER NOT NULL,
+                    chunk_no INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    owner_id INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    PRIMARY KEY (document_id, chunk_no)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    document_id INTEGER NOT NULL,
+                    owner_id INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (term, document_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_document ON postings (document_id);
+                CREATE TABLE IF NOT EXISTS terms (
+                    term TEXT PRIMARY KEY,
+                    df INTEGER NOT NULL
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    chunks INTEGER NOT NULL,
+                    total_length INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO stats (id, chunks, total_length) VALUES (1, 0, 0);
+                """
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """A write transaction that holds SQLite's write lock from the start.
+
+        ``_delete`` reads a document's postings to decrement ``df``; taking the
+        lock first (``BEGIN IMMEDIATE``) stops another process re-indexing at
+        the same time from applying its update to the same stale counts.
+        """
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    def add_document(self, document_id, owner_id, chunk_ids, texts):
+        """(Re)index a document's chunks, replacing anything indexed for it before."""
+        postings = defaultdict(list)
+        chunk_rows = []
+        for chunk_no, (cid, text) in enumerate(zip(chunk_ids, texts)):
+            counts = Counter(tokenize(text))
+            chunk_rows.append((document_id, chunk_no, cid, owner_id, sum(counts.values())))
+            for term, tf in counts.items():
+                postings[term].append((chunk_no, tf))
+
+        with self._write() as conn:
+            self._delete(conn, document_id)
+            conn.executemany(
+                "INSERT INTO chunks (document_id, chunk_no, chunk_id, owner_id, length) VALUES (?, ?, ?, ?, ?)",
+                chunk_rows,
+            )
+            conn.executemany(
+                "INSERT INTO postings (term, document_id, owner_id, data) VALUES (?, ?, ?, ?)",
+                [(term, document_id, owner_id, _pack(pairs)) for term, pairs in postings.items()],
+            )
+            conn.executemany(
+                "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                [(term, len(pairs)) for term, pairs in postings.items()],
+            )
+            conn.execute(
+                "UPDATE stats SET chunks = chunks + ?, total_length = total_length + ?",
+                (len(chunk_rows), sum(row[4] for row in chunk_rows)),
+            )
+
+    def document_ids(self):
+        return [row[0] for row in self._conn().execute("SELECT DISTINCT document_id FROM chunks")]
+
+    def delete_document(self, document_id):
+        with self._write() as conn:
+            self._delete(conn, document_id)
+
+    def _delete(self, conn, document_id):
+        rows = conn.execute("SELECT term, data FROM postings WHERE document_id = ?", (document_id,)).fetchall()
+        if rows:
+            conn.executemany(
+                "UPDATE terms SET df = df - ? WHERE term = ?",
+                [(len(blob) // 8, term) for term, blob in rows],
+            )
+            conn.execute("DELETE FROM terms WHERE df <= 0")
+            conn.execute("DELETE FROM postings WHERE document_id = ?", (document_id,))
+        count, length = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE document_id = ?", (document_id,)
+        ).fetchone()
+        if count:
+            conn.execute(
+                "UPDATE stats SET chunks = chunks - ?, total_length = total_length - ?", (count, length)
+            )
+            conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+
+    def search(self, query, owner_id, document_ids=None, k=10):
+        """Return up to k hits ``{"id", "document_id", "score"}`` ranked by BM25."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        conn = self._conn()
+        n_chunks, total_length = conn.execute("SELECT chunks, total_length FROM stats").fetchone()
+        if not n_chunks:
+            return []
+        avg_length = total_length / n_chunks
+
+        marks = ",".join("?" * len(terms))
+        df = dict(conn.execute(f"SELECT term, df FROM terms WHERE term IN ({marks})", terms))
+        sql = f"SELECT term, document_id, data FROM postings WHERE term IN ({marks}) AND owner_id = ?"
+        params = [*terms, owner_id]
+        if document_ids:
+            sql += f" AND document_id IN ({','.join('?' * len(document_ids))})"
+            params.extend(document_ids)
+
+        tfs = defaultdict(dict)  # (document_id, chunk_no) -> {term: tf}
+        for term, document_id, blob in conn.execute(sql, params):
+            for chunk_no, tf in _unpack(blob):
+                tfs[(document_id, chunk_no)][term] = tf
+        if not tfs:
+            return []
+
+        chunks = self._chunk_rows(conn, list(tfs))
+        scored = []
+        for key, term_tfs in tfs.items():
+            length, chunk_id = chunks[key]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+            score = 0.0
+            for term, tf in term_tfs.items():
+                idf = math.log(1 + (n_chunks - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            scored.append((score, chunk_id, key[0]))
+
+        scored.sort(reverse=True)
+        return [{"id": cid, "document_id": doc, "score": score} for score, cid, doc in scored[:k]]
+
+    def _chunk_rows(self, conn, keys):
+        """``(length, chunk id)`` of just the matched ``(document_id, chunk_no)`` keys, by primary key."""
+        found = {}
+        for start in range(0, len(keys), CHUNK_LOOKUP_BATCH):
+            batch = keys[start:start + CHUNK_LOOKUP_BATCH]
+            rows = conn.execute(
+                f"WITH matched (document_id, chunk_no) AS (VALUES {','.join(['(?, ?)'] * len(batch))}) "
+                "SELECT c.document_id, c.chunk_no, c.length, c.chunk_id FROM matched m "
+                "JOIN chunks c ON c.document_id = m.document_id AND c.chunk_no = m.chunk_no",  # primary-key probes
+                [v for key in batch for v in key],
+            )
+            found.update(((doc, no), (length, cid)) for doc, no, length, cid in rows)
+        return found
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LexicalIndex()
+    return _index
@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.models import ChatHistory, Document
+from api.pagination import encode_keyset_cursor
+from api.views import history_page
+
+BENCH_USERNAME = "__bench_chat_history__"
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    help = "Seed a document with many chats and time history pages (keyset vs OFFSET) and bulk clear."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chats", type=int, default=100_000)
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--keep", action="store_true", help="Leave the seeded user and chats in place.")
+
+    def handle(self, *args, **options):
+        n, limit, repeat = options["chats"], options["page_size"], options["repeat"]
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create_user(BENCH_USERNAME)
+        document = Document.objects.create(owner=user, title="bench", file="bench.txt")
+
+        started = time.perf_counter()
+        answer = "lorem ipsum dolor sit amet " * 40
+        ChatHistory.objects.bulk_create(
+            (ChatHistory(document=document, question=f"question {i}?", answer=answer) for i in range(n)),
+            batch_size=5000,
+        )
+        self.stdout.write(f"Seeded {n} chats in {time.perf_counter() - started:.1f}s ({connection.vendor})")
+
+        # cursor pointing at the last page, as a client paging through everything would reach it
+        deep_offset = max(n - limit, 0)
+        last = (
+            ChatHistory.objects.filter(document=document)
+            .order_by("-created_at", "-id")
+            .values("id", "created_at")[deep_offset]
+        )
+        deep_cursor = encode_keyset_cursor(last["created_at"], last["id"])
+
+        def offset_page(offset):
+            return list(
+                ChatHistory.objects.filter(document=document, document__owner=user)
+                .order_by("-created_at", "-id")
+                .values("id", "document", "question", "answer", "created_at")[offset:offset + limit]
+            )
+
+        rows = [
+            ("keyset first page", timed(lambda: history_page(document.id, user, limit=limit), repeat)),
+            ("keyset last page", timed(lambda: history_page(document.id, user, deep_cursor, limit), repeat)),
+            ("keyset last page (summary)",
+             timed(lambda: history_page(document.id, user, deep_cursor, limit, summary=True), repeat)),
+            ("OFFSET first page", timed(lambda: offset_page(0), repeat)),
+            ("OFFSET last page", timed(lambda: offset_page(deep_offset), repeat)),
+            ("unpaginated (old view)",
+             timed(lambda: list(ChatHistory.objects.filter(document=document).order_by("-created_at").values()), 1)),
+        ]
+        for label, ms in rows:
+            self.stdout.write(f"{label:<28} {ms:9.2f} ms")
+
+        if options["keep"]:
+            return
+        started = time.perf_counter()
+        deleted, _ = ChatHistory.objects.filter(document=document, document__owner=user).delete()
+        self.stdout.write(f"{'bulk clear':<28} {(time.perf_counter() - started) * 1000:9.2f} ms ({deleted} rows)")
+        user.delete()
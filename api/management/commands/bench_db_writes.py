@@ -0,0 +1,135 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from api.models import ChatHistory, Document, IngestionJob
+
+# (label, sqlite OPTIONS, journal mode, reuse the connection across operations)
+PROFILES = [
+    ("django defaults", {}, "DELETE", False),
+    ("tuned, new connection per op", settings.SQLITE_OPTIONS, "WAL", False),
+    ("tuned, persistent connection", settings.SQLITE_OPTIONS, "WAL", True),
+]
+
+
+def register_database(alias, path, options):
+    """Add a SQLite database alias at runtime (the benchmark's scratch databases)."""
+    config = {"ENGINE": "django.db.backends.sqlite3", "NAME": str(path), "OPTIONS": dict(options)}
+    connections.settings[alias] = connections.configure_settings({DEFAULT_DB_ALIAS: config, alias: config})[alias]
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent write benchmark for SQLite: chat inserts plus job progress updates from many threads "
+        "while readers page history, under Django's defaults and the tuned settings.SQLITE_OPTIONS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writes", type=int, default=200, help="Transactions per writer thread.")
+
+    def handle(self, *args, **options):
+        workdir = Path(tempfile.mkdtemp(prefix="bench_db_writes_"))
+        self.stdout.write(
+            f"{options['writers']} writers x {options['writes']} transactions, {options['readers']} readers "
+            f"(SQLite {'.'.join(map(str, connections[DEFAULT_DB_ALIAS].Database.sqlite_version_info))}, "
+            f"data in {workdir})"
+        )
+        self.stdout.write(
+            f"{'profile':<32} {'writes/s':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'reads/s':>8}"
+        )
+        for i, (label, sqlite_options, journal_mode, reuse) in enumerate(PROFILES):
+            alias = f"bench_{i}"
+            register_database(alias, workdir / f"{alias}.sqlite3", sqlite_options)
+            call_command("migrate", database=alias, verbosity=0)  # switches the file to WAL
+            with connections[alias].cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            result = self.run_profile(alias, reuse, options)
+            connections[alias].close()
+            self.stdout.write(
+                f"{label:<32} {result['writes_per_s']:9.1f} {result['errors']:7d} "
+                f"{result['p50']:8.2f} {result['p95']:8.2f} {result['p99']:8.2f} {result['reads_per_s']:8.1f}"
+            )
+
+    def run_profile(self, alias, reuse, options):
+        user = User.objects.db_manager(alias).create_user("bench")
+        document = Document.objects.using(alias).create(owner=user, title="bench", file="bench.txt")
+        job = IngestionJob.objects.using(alias).create(document=document)
+
+        latencies, errors, reads = [], [0], [0]
+        lock = threading.Lock()
+        writing = threading.Event()
+        writing.set()
+
+        def write(n):
+            # the shape of an ask + an ingestion progress save: read, then two writes in one transaction
+            with transaction.atomic(using=alias):
+                progress = IngestionJob.objects.using(alias).values_list("progress", flat=True).get(id=job.id)
+                ChatHistory.objects.using(alias).create(document=document, question=f"q{n}", answer="a" * 500)
+                IngestionJob.objects.using(alias).filter(id=job.id).update(progress={**progress, "n": n})
+
+        def writer(worker):
+            samples, failed = [], 0
+            for n in range(options["writes"]):
+                started = time.perf_counter()
+                try:
+                    write(worker * options["writes"] + n)
+                except OperationalError:  # "database is locked"
+                    failed += 1
+                else:
+                    samples.append((time.perf_counter() - started) * 1000)
+                if not reuse:
+                    connections[alias].close()
+            connections[alias].close()
+            with lock:
+                latencies.extend(samples)
+                errors[0] += failed
+
+        def reader():
+            done = 0
+            while writing.is_set():
+                try:
+                    list(
+                        ChatHistory.objects.using(alias).filter(document=document)
+                        .order_by("-created_at", "-id").values("id", "question")[:50]
+                    )
+                    done += 1
+                except OperationalError:
+                    pass
+                if not reuse:
+                    connections[alias].close()
+            connections[alias].close()
+            with lock:
+                reads[0] += done
+
+        readers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        writers = [threading.Thread(target=writer, args=(w,)) for w in range(options["writers"])]
+        for t in readers:
+            t.start()
+        started = time.perf_counter()
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+        seconds = time.perf_counter() - started
+        writing.clear()
+        for t in readers:
+            t.join()
+
+        return {
+            "writes_per_s": len(latencies) / seconds,
+            "errors": errors[0],
+            "p50": float(np.percentile(latencies, 50)) if latencies else 0.0,
+            "p95": float(np.percentile(latencies, 95)) if latencies else 0.0,
+            "p99": float(np.percentile(latencies, 99)) if latencies else 0.0,
+            "reads_per_s": reads[0] / seconds,
+        }
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import platform
+import resource
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import embedding_cache, gemini_wrapper, vector_store
+from api.chunking import CHUNK_STRATEGY
+from api.embeddings import get_embedding_service
+from api.fake_llm import start_in_thread
+from api.ingestion import enqueue_ingestion, run_job
+from api.models import Chunk, Document, IngestionJob
+from api.reranker import reranker
+from api.retrieval import retrieve
+
+BENCH_USERNAME = "__bench_rag__"
+SYLLABLES = ["ka", "lo", "mi", "ren", "tor", "sa", "vel", "qu", "dan", "ix", "or", "pe", "zu", "bra", "fen", "hol"]
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES, rng.integers(2, 5))))
+    return sorted(words)
+
+
+def sentence(rng, words):
+    # Zipf-like word frequencies so BM25 and the embeddings see realistic term skew
+    picks = np.minimum(rng.zipf(1.3, rng.integers(8, 21)), len(words)) - 1
+    text = " ".join(words[i] for i in picks)
+    return text[0].upper() + text[1:] + "."
+
+
+def synthetic_pages(rng, words, pages, words_per_page):
+    for page_no in range(pages):
+        lines, count = [f"Section {page_no + 1}. {words[rng.integers(len(words))].title()}"], 0
+        while count < words_per_page:
+            paragraph = " ".join(sentence(rng, words) for _ in range(rng.integers(3, 7)))
+            count += paragraph.count(" ") + 1
+            lines.append(paragraph)
+        yield "\n\n".join(lines)
+
+
+def synthetic_pdf(pages):
+    pdf = fitz.open()
+    for text in pages:
+        page = pdf.new_page()
+        for fontsize in (9, 8, 7, 6, 5, 4):  # shrink until the page's text fits (nothing is written otherwise)
+            if page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=fontsize) >= 0:
+                break
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(samples, 50)), 2),
+        "p95_ms": round(float(np.percentile(samples, 95)), 2),
+        "p99_ms": round(float(np.percentile(samples, 99)), 2),
+        "mean_ms": round(statistics.mean(samples), 2),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its (extraction) child processes, in MiB (Linux kB)."""
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Offline end-to-end RAG benchmark: ingest a synthetic corpus, then time embedding, retrieval "
+        "and /api/ask/ under concurrency against a local fake Gemini. Writes JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pdfs", type=int, default=4, help="Synthetic PDF documents.")
+        parser.add_argument("--texts", type=int, default=4, help="Synthetic plain-text documents.")
+        parser.add_argument("--pages", type=int, default=20, help="Pages per document.")
+        parser.add_argument("--words-per-page", type=int, default=350)
+        parser.add_argument("--vocabulary", type=int, default=3000)
+        parser.add_argument("--queries", type=int, default=200, help="Retrieval and ask requests each.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--embed-sample", type=int, default=512, help="Chunks re-embedded for throughput.")
+        parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake Gemini seconds per answer.")
+        parser.add_argument("--warm-cache", action="store_true", help="Let ingestion use the embedding cache.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the JSON results here as well as to stdout.")
+        parser.add_argument("--keep", action="store_true", help="Leave the bench user and documents in place.")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        words = vocabulary(rng, options["vocabulary"])
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create_user(BENCH_USERNAME)
+
+        server, url = start_in_thread(port=0, latency=options["llm_latency"])
+        gemini_wrapper.configure("bench", endpoint=url)
+        if not options["warm_cache"]:
+            embedding_cache.EMBEDDING_CACHE_ENABLED = False
+
+        try:
+            results = {"config": self.config(options)}
+            documents = self.create_documents(rng, words, user, options)
+            results["ingest"] = self.bench_ingest(documents)
+            results["embedding"] = self.bench_embedding(user, options["embed_sample"])
+            questions = [" ".join(sentence(rng, words).split()[:8]) for _ in range(options["queries"])]
+            results["retrieval"] = self.bench_retrieval(user, questions, options["concurrency"])
+            results["ask"] = asyncio.run(self.bench_ask(user, documents, questions, options["concurrency"]))
+            results["peak_rss_mb"] = peak_rss_mb()
+        finally:
+            server.shutdown()
+            if not options["keep"]:
+                for doc in Document.objects.filter(owner=user):
+                    doc.file.delete(save=False)
+                user.delete()
+
+        payload = json.dumps(results, indent=2)
+        self.stdout.write(payload)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(payload + "\n")
+
+    def config(self, options):
+        service = get_embedding_service()
+        return {
+            **{k: options[k] for k in (
+                "pdfs", "texts", "pages", "words_per_page", "queries", "concurrency", "llm_latency", "seed"
+            )},
+            "embedding_model": service.model_name,
+            "embedding_backend": service.backend_name,
+            "chunk_strategy": CHUNK_STRATEGY,
+            "vector_index": vector_store.VECTOR_INDEX,
+            "reranker": reranker.enabled,
+            "python": platform.python_version(),
+        }
+
+    def create_documents(self, rng, words, user, options):
+        documents = []
+        for i in range(options["pdfs"] + options["texts"]):
+            pages = list(synthetic_pages(rng, words, options["pages"], options["words_per_page"]))
+            if i < options["pdfs"]:
+                name, data = f"bench-{i}.pdf", synthetic_pdf(pages)
+            else:
+                name, data = f"bench-{i}.txt", "\n\n".join(pages).encode()
+            doc = Document(owner=user, title=name)
+            doc.file.save(name, ContentFile(data), save=True)
+            documents.append(doc)
+        return documents
+
+    def bench_ingest(self, documents):
+        with override_settings(INGEST_INLINE=False):
+            jobs = [enqueue_ingestion(doc) for doc in documents]
+        started = time.perf_counter()
+        for job in jobs:
+            run_job(job.id)
+        seconds = time.perf_counter() - started
+
+        jobs = list(IngestionJob.objects.filter(id__in=[j.id for j in jobs]))
+        failed = [j.id for j in jobs if j.status != IngestionJob.DONE]
+        pages = sum(j.progress["extract"].get("pages", 0) for j in jobs)
+        chunks = sum(j.progress["chunk"].get("chunks", 0) for j in jobs)
+        stages = {
+            stage: round(sum(j.progress[stage].get("seconds", 0) for j in jobs), 3) for stage in IngestionJob.STAGES
+        }
+        return {
+            "documents": len(jobs),
+            "failed_jobs": failed,
+            "pages": pages,
+            "chunks": chunks,
+            "seconds": round(seconds, 3),
+            "pages_per_s": round(pages / seconds, 2),
+            "chunks_per_s": round(chunks / seconds, 2),
+            "stage_seconds": stages,
+        }
+
+    def bench_embedding(self, user, sample):
+        texts = list(
+            Chunk.objects.filter(document__owner=user).order_by("id").values_list("text", flat=True)[:sample]
+        )
+        service = get_embedding_service()
+        service.encode(texts[:1])  # load the model outside the timing
+        tokens = sum(service.count_tokens(t) for t in texts)
+        started = time.perf_counter()
+        service.encode(texts)
+        seconds = time.perf_counter() - started
+        return {
+            "texts": len(texts),
+            "tokens": tokens,
+            "seconds": round(seconds, 3),
+            "texts_per_s": round(len(texts) / seconds, 2),
+            "tokens_per_s": round(tokens / seconds, 2),
+        }
+
+    def bench_retrieval(self, user, questions, concurrency):
+        def one(question):
+            started = time.perf_counter()
+            retrieve(question, user.id)
+            return (time.perf_counter() - started) * 1000
+
+        retrieve(questions[0], user.id)  # warm up
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, questions))
+        seconds = time.perf_counter() - started
+        return {**percentiles(latencies), "requests_per_s": round(len(questions) / seconds, 2)}
+
+    async def bench_ask(self, user, documents, questions, concurrency):
+        client = AsyncClient()
+        headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        gate = asyncio.Semaphore(concurrency)
+        latencies, errors, cached = [], 0, 0
+
+        async def one(i, question):
+            nonlocal errors, cached
+            body = {"document_id": documents[i % len(documents)].id, "question": f"{question} ({i})?"}
+            async with gate:
+                started = time.perf_counter()
+                response = await client.post("/api/ask/", body, content_type="application/json", headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+            elif response.json().get("cached"):
+                cached += 1
+
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i, q) for i, q in enumerate(questions)))
+            seconds = time.perf_counter() - started
+        return {
+            **percentiles(latencies),
+            "requests_per_s": round(len(questions) / seconds, 2),
+            "errors": errors,
+            "cached": cached,
+        }
@@ -0,0 +1,108 @@
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import chromadb
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.quantized_index import QuantizedIndex
+
+
+def synthetic_vectors(rng, n, dim, clusters):
+    """Clustered unit vectors, closer to real embedding distributions than uniform noise."""
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def dir_bytes(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q))
+
+
+class Command(BaseCommand):
+    help = "Compare recall@k and query latency of the Chroma HNSW store and the int8 quantized index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vectors", type=int, default=50_000)
+        parser.add_argument("--dim", type=int, default=384)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--documents", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        n, dim, k = options["vectors"], options["dim"], options["k"]
+        rng = np.random.default_rng(options["seed"])
+        vectors = synthetic_vectors(rng, n, dim, clusters=max(n // 250, 8))
+        queries = synthetic_vectors(rng, options["queries"], dim, clusters=max(n // 250, 8))
+        documents = np.arange(n) % options["documents"]
+        ids = [f"{documents[i]}-{i}" for i in range(n)]
+        truth = [set(np.argsort(-(vectors @ q))[:k]) for q in queries]
+        workdir = Path(tempfile.mkdtemp(prefix="bench_vector_index_"))
+        self.stdout.write(f"{n} vectors x {dim} dims, {len(queries)} queries, k={k} (data in {workdir})")
+
+        # Chroma (current store)
+        client = chromadb.PersistentClient(path=str(workdir / "chroma"))
+        collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+        started = time.perf_counter()
+        for start in range(0, n, 5000):
+            end = min(start + 5000, n)
+            collection.add(
+                ids=ids[start:end],
+                embeddings=vectors[start:end],
+                metadatas=[{"document_id": int(documents[i]), "owner_id": 1} for i in range(start, end)],
+            )
+        chroma_build = time.perf_counter() - started
+
+        # quantized index
+        index = QuantizedIndex(workdir / "quant")
+        started = time.perf_counter()
+        for doc in range(options["documents"]):
+            rows = np.flatnonzero(documents == doc)
+            index.add(int(doc), 1, [ids[i] for i in rows], vectors[rows])
+        quant_build = time.perf_counter() - started
+
+        def run(search):
+            latencies, hits = [], 0
+            for q, expected in zip(queries, truth):
+                started = time.perf_counter()
+                found = search(q)
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += len({int(cid.rsplit("-", 1)[1]) for cid in found} & expected)
+            return hits / (k * len(queries)), latencies
+
+        results = {
+            "chroma (float32 HNSW)": run(
+                lambda q: collection.query(query_embeddings=[q], n_results=k, where={"owner_id": 1}, include=[])["ids"][0]
+            ),
+            "quantized int8 + re-rank": run(lambda q: [h["id"] for h in index.search(q, 1, None, k)]),
+            "quantized int8, no re-rank": run(lambda q: [h["id"] for h in index.search(q, 1, None, k, oversample=1)]),
+            "quantized, 1 document filter": run(
+                lambda q: [h["id"] for h in index.search(q, 1, [int(documents[0])], k)]
+            ),
+        }
+
+        self.stdout.write(f"{'index':<30} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+        for label, (recall, latencies) in results.items():
+            if "1 document" in label:
+                recall_text = "n/a"
+            else:
+                recall_text = f"{recall:.3f}"
+            self.stdout.write(
+                f"{label:<30} {recall_text:>9} {percentile(latencies, 50):8.2f} "
+                f"{percentile(latencies, 95):8.2f} {statistics.mean(latencies):8.2f}"
+            )
+
+        sizes = index.nbytes()
+        self.stdout.write(f"build: chroma {chroma_build:.1f}s, quantized {quant_build:.1f}s")
+        self.stdout.write(
+            f"disk: chroma {dir_bytes(workdir / 'chroma') / 2**20:.1f} MiB; quantized "
+            f"{dir_bytes(workdir / 'quant') / 2**20:.1f} MiB = codes {sizes['codes'] / 2**20:.1f} MiB (scanned) "
+            f"+ exact {sizes['exact'] / 2**20:.1f} MiB (re-rank only) + row table"
+        )
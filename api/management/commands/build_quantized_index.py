@@ -0,0 +1,60 @@
+import shutil
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api import vector_store
+from api.quantized_index import QUANT_INDEX_DIR, QuantizedIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the int8 quantized vector index from the shared Chroma collection, "
+        "e.g. before switching to VECTOR_INDEX=quantized."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=QUANT_INDEX_DIR)
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--compact", action="store_true", help="Only drop tombstoned rows from the existing index.")
+        parser.add_argument(
+            "--drop-chroma",
+            action="store_true",
+            help="Delete the Chroma collection once copied; the quantized index then holds the only vectors.",
+        )
+
+    def handle(self, *args, **options):
+        if options["compact"]:
+            dropped = QuantizedIndex(options["path"]).compact()
+            self.stdout.write(self.style.SUCCESS(f"Dropped {dropped} deleted vectors"))
+            return
+
+        if vector_store.VECTOR_INDEX == "quantized" and QuantizedIndex(options["path"]).live_chunks():
+            # with VECTOR_INDEX=quantized new vectors are only written here
+            raise CommandError("The quantized index is the live vector store; refusing to rebuild it from Chroma.")
+
+        shutil.rmtree(options["path"], ignore_errors=True)
+        index = QuantizedIndex(options["path"])
+        collection = vector_store.get_collection()
+        total = collection.count()
+        for offset in range(0, total, options["batch_size"]):
+            batch = collection.get(limit=options["batch_size"], offset=offset, include=["embeddings", "metadatas"])
+            groups = {}  # (document_id, owner_id) -> ([ids], [vectors])
+            for cid, vector, meta in zip(batch["ids"], batch["embeddings"], batch["metadatas"]):
+                ids, vectors = groups.setdefault((meta["document_id"], meta["owner_id"]), ([], []))
+                ids.append(cid)
+                vectors.append(vector)
+            for (document_id, owner_id), (ids, vectors) in groups.items():
+                index.add(document_id, owner_id, ids, np.asarray(vectors, dtype=np.float32))
+
+        if options["drop_chroma"]:
+            vector_store.get_client().delete_collection(vector_store.COLLECTION_NAME)
+
+        sizes = index.nbytes()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {total} vectors: {sizes['codes'] / 2**20:.1f} MiB scanned codes, "
+                f"{sizes['exact'] / 2**20:.1f} MiB exact vectors for re-ranking"
+                + ("; Chroma collection dropped" if options["drop_chroma"] else "")
+            )
+        )
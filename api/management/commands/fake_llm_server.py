@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from api.fake_llm import make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the Gemini REST API (generateContent / streamGenerateContent). "
+        "Point the app at it with GEMINI_API_ENDPOINT=http://127.0.0.1:<port>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.2, help="Seconds per response.")
+        parser.add_argument(
+            "--model-latency", nargs="*", metavar="MODEL=SECONDS", help="Per-model latency overrides."
+        )
+        parser.add_argument("--fail", nargs="*", default=[], metavar="MODEL", help="Models that always return 500.")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Random 500 probability.")
+        parser.add_argument("--tokens", type=int, default=40, help="Words per answer.")
+
+    def handle(self, *args, **options):
+        server = make_server(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"],
+            model_latency={
+                name: float(seconds)
+                for name, seconds in (item.split("=", 1) for item in options["model_latency"] or [])
+            },
+            fail_models=options["fail"],
+            error_rate=options["error_rate"],
+            tokens=options["tokens"],
+        )
+        self.stdout.write(f"Fake Gemini listening on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
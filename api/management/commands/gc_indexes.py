@@ -0,0 +1,69 @@
+import shutil
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from api import vector_store
+from api.lexical_index import get_lexical_index
+from api.models import Chunk, Document
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove index data that no longer belongs to a document: legacy db/doc_* stores, "
+        "vectors in the shared vector store and lexical postings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--legacy-dir", default=str(vector_store.LEGACY_DB_DIR))
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without removing it.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        live = set(Document.objects.values_list("id", flat=True))
+        verb = "Would remove" if dry_run else "Removed"
+
+        # 1. legacy one-store-per-document directories
+        dirs = 0
+        for store_dir in sorted(Path(options["legacy_dir"]).glob("doc_*")):
+            try:
+                doc_id = int(store_dir.name.split("_", 1)[1])
+            except ValueError:
+                continue
+            if doc_id not in live:
+                dirs += 1
+                if not dry_run:
+                    shutil.rmtree(store_dir, ignore_errors=True)
+        self.stdout.write(f"{verb} {dirs} orphaned legacy store(s)")
+
+        # 2. vectors of deleted documents, and stale vectors left by interrupted re-indexes
+        by_document = defaultdict(list)
+        total = 0
+        for cid, document_id in vector_store.iter_chunk_ids(options["batch_size"]):
+            by_document[document_id].append(cid)
+            total += 1
+
+        orphaned = []
+        for document_id, ids in by_document.items():
+            if document_id not in live:
+                orphaned.extend(ids)
+                continue
+            known = set(Chunk.objects.filter(document_id=document_id).values_list("chroma_id", flat=True))
+            if known:  # documents indexed before Chunk rows existed are left alone
+                orphaned.extend(cid for cid in ids if cid not in known)
+        if not dry_run:
+            for start in range(0, len(orphaned), options["batch_size"]):
+                vector_store.delete_chunks(orphaned[start:start + options["batch_size"]])
+        self.stdout.write(f"{verb} {len(orphaned)} orphaned vector(s) of {total}")
+
+        # 3. lexical postings of deleted documents
+        index = get_lexical_index()
+        stale_docs = [d for d in index.document_ids() if d not in live]
+        if not dry_run:
+            for document_id in stale_docs:
+                index.delete_document(document_id)
+        self.stdout.write(f"{verb} lexical postings of {len(stale_docs)} deleted document(s)")
+
+        self.stdout.write(self.style.SUCCESS("Done"))
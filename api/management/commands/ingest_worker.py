@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ingestion import run_batch, run_job
+from api.models import IngestionJob
+
+
+class Command(BaseCommand):
+    help = "Process queued document ingestion jobs from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+        parser.add_argument(
+            "--batch-size", type=int, default=50, help="Jobs of one upload batch run (and embedded) together."
+        )
+        parser.add_argument(
+            "--requeue-running",
+            action="store_true",
+            help="Reset jobs left 'running' by a crashed worker back to 'queued' before starting.",
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue_running"]:
+            count = IngestionJob.objects.filter(status=IngestionJob.RUNNING).update(
+                status=IngestionJob.QUEUED, started_at=None
+            )
+            self.stdout.write(f"Requeued {count} interrupted job(s)")
+
+        while True:
+            queued = list(
+                IngestionJob.objects.filter(status=IngestionJob.QUEUED)
+                .order_by("created_at")
+                .values_list("id", "batch")[:10]
+            )
+            job_ids = [job_id for job_id, _ in queued]
+            for batch in dict.fromkeys(b for _, b in queued if b):
+                batch_ids = list(
+                    IngestionJob.objects.filter(status=IngestionJob.QUEUED, batch=batch).values_list("id", flat=True)
+                )
+                for start in range(0, len(batch_ids), options["batch_size"]):
+                    ran = run_batch(batch_ids[start:start + options["batch_size"]])
+                    self.stdout.write(f"Processed {ran} job(s) of batch {batch}")
+            for job_id, batch in queued:
+                if not batch and run_job(job_id):
+                    self.stdout.write(f"Processed job {job_id}")
+
+            if options["once"] and not job_ids:
+                return
+            if not job_ids:
+                time.sleep(options["poll"])
@@ -0,0 +1,78 @@
+import shutil
+from pathlib import Path
+
+import chromadb
+from django.core.management.base import BaseCommand
+
+from api import vector_store
+from api.ingestion import enqueue_ingestion
+from api.lexical_index import get_lexical_index
+from api.models import Document
+
+# Collection name LangChain's Chroma wrapper used in the legacy db/doc_* stores
+LEGACY_COLLECTION = "langchain"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold legacy per-document Chroma stores (db/doc_*) into the shared vector store, index them for BM25 "
+        "and queue a forced re-index that creates their Chunk rows and content-addressed vectors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=str(vector_store.LEGACY_DB_DIR), help="Directory holding doc_* stores.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--delete", action="store_true", help="Remove each legacy store once migrated.")
+
+    def handle(self, *args, **options):
+        source = Path(options["source"])
+        migrated = skipped = 0
+
+        for store_dir in sorted(source.glob("doc_*")):
+            try:
+                doc_id = int(store_dir.name.split("_", 1)[1])
+                document = Document.objects.only("id", "owner_id").get(id=doc_id)
+            except (ValueError, Document.DoesNotExist):
+                self.stdout.write(self.style.WARNING(f"Skipping {store_dir}: no matching document"))
+                skipped += 1
+                continue
+
+            legacy = chromadb.PersistentClient(path=str(store_dir))
+            try:
+                old = legacy.get_collection(LEGACY_COLLECTION)
+            except Exception:
+                self.stdout.write(self.style.WARNING(f"Skipping {store_dir}: no '{LEGACY_COLLECTION}' collection"))
+                skipped += 1
+                continue
+
+            total = old.count()
+            ids, texts = [], []
+            for offset in range(0, total, options["batch_size"]):
+                batch = old.get(
+                    limit=options["batch_size"], offset=offset, include=["embeddings", "documents"]
+                )
+                chunks = [
+                    {"id": vector_store.chunk_id(doc_id, offset + i), "text": text, "position": offset + i}
+                    for i, text in enumerate(batch["documents"])
+                ]
+                vector_store.add_chunks(document, chunks, batch["embeddings"])
+                ids.extend(c["id"] for c in chunks)
+                texts.extend(batch["documents"])
+
+            # searchable by BM25 right away; the forced re-index then replaces the
+            # position-based ids with content-addressed ones and writes Chunk rows
+            get_lexical_index().add_document(doc_id, document.owner_id, ids, texts)
+            enqueue_ingestion(document, force=True)
+
+            del legacy
+            if options["delete"]:
+                shutil.rmtree(store_dir)
+            migrated += 1
+            self.stdout.write(f"Migrated {store_dir} ({total} chunks)")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done: {migrated} migrated, {skipped} skipped; {migrated} re-index job(s) queued "
+                "(run `manage.py ingest_worker` if INGEST_INLINE=0)"
+            )
+        )
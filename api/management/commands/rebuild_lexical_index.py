@@ -0,0 +1,43 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from api import vector_store
+from api.lexical_index import get_lexical_index
+from api.models import Chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the BM25 lexical index from the Chunk table; documents indexed before chunk rows "
+        "existed are read from the shared Chroma collection."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        documents = defaultdict(list)  # document_id -> [(chunk_no, id, text, owner_id)]
+        rows = (
+            Chunk.objects.exclude(chroma_id=None)
+            .values_list("document_id", "position", "chroma_id", "text", "document__owner_id")
+            .iterator(chunk_size=options["batch_size"])
+        )
+        for document_id, position, cid, text, owner_id in rows:
+            documents[document_id].append((position, cid, text, owner_id))
+
+        if vector_store.VECTOR_INDEX != "quantized":  # in quantized mode Chroma holds no chunks
+            collection = vector_store.get_collection()
+            with_rows = set(documents)
+            for offset in range(0, collection.count(), options["batch_size"]):
+                batch = collection.get(limit=options["batch_size"], offset=offset, include=["documents", "metadatas"])
+                for cid, text, meta in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                    if meta["document_id"] not in with_rows:
+                        documents[meta["document_id"]].append((meta.get("chunk", 0), cid, text, meta["owner_id"]))
+
+        index = get_lexical_index()
+        for document_id, chunks in documents.items():
+            chunks.sort()
+            index.add_document(document_id, chunks[0][3], [c[1] for c in chunks], [c[2] for c in chunks])
+        total = sum(map(len, documents.values()))
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} chunks from {len(documents)} documents"))
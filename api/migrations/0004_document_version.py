@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_ingestionjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
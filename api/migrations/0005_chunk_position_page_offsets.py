@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_document_version"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="chunk",
+            options={"ordering": ["document", "position"]},
+        ),
+        migrations.AddField(
+            model_name="chunk",
+            name="end_offset",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chunk",
+            name="page",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chunk",
+            name="position",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="chunk",
+            name="start_offset",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="chunk",
+            name="chroma_id",
+            field=models.CharField(
+                blank=True, db_index=True, max_length=255, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chunk",
+            index=models.Index(
+                fields=["document", "position"], name="api_chunk_documen_e76c6e_idx"
+            ),
+        ),
+    ]
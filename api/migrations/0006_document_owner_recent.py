@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_chunk_position_page_offsets"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(
+                fields=["owner", "-created_at", "-id"], name="document_owner_recent"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_document_owner_recent"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chathistory",
+            index=models.Index(
+                fields=["document", "-created_at", "-id"], name="chat_document_recent"
+            ),
+        ),
+    ]
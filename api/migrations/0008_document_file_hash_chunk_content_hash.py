@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_chat_document_recent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chunk",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="file_hash",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=64
+            ),
+        ),
+    ]
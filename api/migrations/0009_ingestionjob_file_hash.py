@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_document_file_hash_chunk_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingestionjob",
+            name="file_hash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_ingestionjob_file_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingestionjob",
+            name="batch",
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+    ]
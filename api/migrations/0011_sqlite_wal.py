@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def set_journal_mode(mode):
+    def run(apps, schema_editor):
+        # journal_mode=WAL is stored in the database file, so it only has to be set once
+        if schema_editor.connection.vendor == "sqlite":
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode={mode}")
+
+    return run
+
+
+class Migration(migrations.Migration):
+    atomic = False  # the journal mode can't change inside a transaction
+
+    dependencies = [
+        ("api", "0010_ingestionjob_batch"),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode("WAL"), set_journal_mode("DELETE")),
+    ]
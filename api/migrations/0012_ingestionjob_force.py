@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_sqlite_wal"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingestionjob",
+            name="force",
+            field=models.BooleanField(default=False),
+        ),
+    ]
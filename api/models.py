@@ -6,21 +6,70 @@ class Document(models.Model):
     title = models.CharField(max_length=255)
     file = models.FileField(upload_to='documents/')
     text = models.TextField(blank=True, null=True)  # ✅ Add this line
+    version = models.PositiveIntegerField(default=0)  # bumped every time the indexed content changes
+    file_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)  # sha256 of the indexed file
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["owner", "-created_at", "-id"], name="document_owner_recent")]
+
     def __str__(self):
         return self.title
 
 
 class Chunk(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="chunks")
+    position = models.PositiveIntegerField(default=0)  # order within the document
+    page = models.PositiveIntegerField(null=True, blank=True)  # 1-based page the chunk starts on
+    start_offset = models.PositiveIntegerField(null=True, blank=True)  # character span in the extracted text
+    end_offset = models.PositiveIntegerField(null=True, blank=True)
     text = models.TextField()
+    content_hash = models.CharField(max_length=32, blank=True, default="")  # xxh3-128 of text
     metadata = models.JSONField(default=dict, blank=True)
-    chroma_id = models.CharField(max_length=255, blank=True, null=True)
+    chroma_id = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ["document", "position"]
+        indexes = [models.Index(fields=["document", "position"])]
+
 class ChatHistory(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="chats", null=True, blank=True)
     question = models.TextField()
     answer = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["document", "-created_at", "-id"], name="chat_document_recent")]
+
+
+class IngestionJob(models.Model):
+    """Background extract → chunk → embed → persist run for one document."""
+
+    STAGES = ["extract", "chunk", "embed", "persist"]
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="jobs")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    stage = models.CharField(max_length=16, blank=True)
+    progress = models.JSONField(default=dict, blank=True)
+    file_hash = models.CharField(max_length=64, blank=True)  # sha256 computed while the upload streamed in
+    batch = models.CharField(max_length=32, blank=True, db_index=True)  # shared by jobs from one batch upload
+    force = models.BooleanField(default=False)  # re-chunk even if the file hash is unchanged (explicit reindex)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status}) for document {self.document_id}"
@@ -0,0 +1,48 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
+
+
+class DocumentCursorPagination(CursorPagination):
+    """Newest documents first; cursors keep deep pages as cheap as the first."""
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
+
+
+class ChunkCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("position",)
+
+
+def encode_keyset_cursor(created_at, pk):
+    return urlsafe_b64encode(f"{created_at.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_keyset_cursor(cursor):
+    """Return ``(created_at, pk)`` from ``encode_keyset_cursor``; raises ValueError if malformed."""
+    created_at, pk = urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), int(pk)
+
+
+def keyset_page(queryset, cursor=None, limit=50):
+    """Newest-first page of ``queryset`` (of dicts with ``id`` and ``created_at``) after ``cursor``.
+
+    Seeks on (created_at, id) instead of OFFSET, so page N costs the same as page 1.
+    Returns ``(rows, next_cursor)``.
+    """
+    if cursor:
+        created_at, pk = decode_keyset_cursor(cursor)
+        # the redundant upper bound lets the (…, -created_at, -id) index seek straight to the cursor
+        queryset = queryset.filter(created_at__lte=created_at).filter(Q(created_at__lt=created_at) | Q(id__lt=pk))
+    rows = list(queryset.order_by("-created_at", "-id")[: limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_keyset_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows, next_cursor
@@ -0,0 +1,277 @@
+"""Compact int8 vector index, memory-mapped from disk.
+
+With ``VECTOR_INDEX=quantized`` this replaces Chroma as the vector store
+(see ``api.vector_store``). Each vector is kept in two forms on disk:
+
+* ``codes.i8``    – int8 scalar-quantized components with a float32 scale per
+  vector (``scales.f32``): 4x smaller than float32, scanned for candidates
+* ``vectors.f32`` – the exact vectors, only touched for the few candidates
+  being re-ranked, so they stay in the page cache rather than in RAM
+
+Row metadata (chunk id, document, owner, live flag) lives in a small SQLite
+table and is mirrored in RAM as int32 arrays for vectorized filtering.
+Deletes are tombstones; ``compact()`` rewrites the files without them.
+``manage.py build_quantized_index`` fills the index from an existing Chroma
+collection.
+
+The API server and ``ingest_worker`` may both write: writers hold an
+exclusive ``flock`` on ``index.lock`` and append at the row count stored on
+disk, and every call checks SQLite's ``data_version`` to pick up rows
+committed by another process (POSIX only).
+"""
+import fcntl
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+QUANT_INDEX_DIR = os.getenv("QUANT_INDEX_DIR", "quant_index")
+# candidates scanned from int8 codes per result before exact re-ranking
+QUANT_OVERSAMPLE = int(os.getenv("QUANT_OVERSAMPLE", "8"))
+SCAN_BLOCK_ROWS = 65536
+
+
+def quantize(vectors):
+    """Symmetric per-vector int8 quantization; returns ``(codes, scales)``."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+FILES = (("codes.i8", np.int8, True), ("scales.f32", np.float32, False), ("vectors.f32", np.float32, True))
+
+
+class QuantizedIndex:
+    def __init__(self, path=QUANT_INDEX_DIR, dim=None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._lock_file = open(self.path / "index.lock", "a")
+        self._lock_depth = 0
+        self._db = sqlite3.connect(self.path / "rows.sqlite3", check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL,
+                document_id INTEGER NOT NULL,
+                owner_id INTEGER NOT NULL,
+                live INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS rows_chunk ON rows (chunk_id);
+            CREATE INDEX IF NOT EXISTS rows_document ON rows (document_id);
+            CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+        self.dim = dim
+        with self._file_lock(exclusive=False):
+            self._load_rows()
+
+    # ---------- storage ----------
+
+    def _file(self, name):
+        return self.path / name
+
+    @contextmanager
+    def _file_lock(self, exclusive=True):
+        """Cross-process lock on the index files; re-entrant within this process."""
+        with self._lock:
+            if not self._lock_depth:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if not self._lock_depth:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _load_rows(self):
+        """Re-read row metadata and reopen the memmaps (call under the file lock)."""
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        stored = self._db.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+        if stored:
+            self.dim = stored[0]
+        rows = self._db.execute("SELECT row, chunk_id, document_id, owner_id, live FROM rows ORDER BY row").fetchall()
+        self._chunk_ids = [r[1] for r in rows]
+        self._documents = np.array([r[2] for r in rows], dtype=np.int32)
+        self._owners = np.array([r[3] for r in rows], dtype=np.int32)
+        self._live = np.array([bool(r[4]) for r in rows], dtype=bool)
+        self._open_maps()
+
+    def _refresh(self):
+        """Reload if another process committed to the index since we last looked."""
+        if self._db.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            with self._file_lock(exclusive=False):
+                self._load_rows()
+
+    def _open_maps(self):
+        # opened while the rows are known to match the files, so a concurrent
+        # compact() (which replaces the files) can't pair new files with old rows
+        n = len(self._chunk_ids)
+        if not n:
+            empty = np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._maps = (empty.astype(np.int8), np.zeros(0, dtype=np.float32), empty)
+            return
+        self._maps = tuple(
+            np.memmap(self._file(name), dtype=dtype, mode="r", shape=(n, self.dim) if per_dim else (n,))
+            for name, dtype, per_dim in FILES
+        )
+
+    def _memmaps(self):
+        return self._maps
+
+    def nbytes(self):
+        """On-disk bytes of the scanned int8 codes and of the exact vectors."""
+        n = len(self._chunk_ids)
+        return {"codes": n * (self.dim or 0) + n * 4, "exact": n * (self.dim or 0) * 4}
+
+    # ---------- writes ----------
+
+    def add(self, document_id, owner_id, ids, vectors):
+        """Append vectors; ids already present are tombstoned first (upsert)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(ids):
+            return
+        with self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with self._db:
+                    self._db.execute("INSERT INTO info (key, value) VALUES ('dim', ?)", (self.dim,))
+            self.delete_chunks(ids)
+            # the row table is authoritative: bytes past its last row are a crashed append
+            start = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+            codes, scales = quantize(vectors)
+            for (name, dtype, per_dim), array in zip(FILES, (codes, scales, vectors)):
+                with open(self._file(name), "ab") as f:
+                    f.truncate(start * np.dtype(dtype).itemsize * (self.dim if per_dim else 1))
+                    f.write(np.ascontiguousarray(array).tobytes())
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO rows (row, chunk_id, document_id, owner_id) VALUES (?, ?, ?, ?)",
+                    [(start + i, cid, document_id, owner_id) for i, cid in enumerate(ids)],
+                )
+            self._chunk_ids.extend(ids)
+            self._documents = np.concatenate([self._documents, np.full(len(ids), document_id, dtype=np.int32)])
+            self._owners = np.concatenate([self._owners, np.full(len(ids), owner_id, dtype=np.int32)])
+            self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+            self._open_maps()
+
+    def _tombstone(self, where, params):
+        with self._file_lock():
+            self._refresh()
+            with self._db:
+                rows = [r[0] for r in self._db.execute(f"SELECT row FROM rows WHERE live = 1 AND {where}", params)]
+                if rows:
+                    self._db.execute(f"UPDATE rows SET live = 0 WHERE {where}", params)
+                    self._live[rows] = False
+
+    def delete_chunks(self, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            self._tombstone(f"chunk_id IN ({','.join('?' * len(batch))})", batch)
+
+    def delete_document(self, document_id):
+        self._tombstone("document_id = ?", (document_id,))
+
+    def document_chunk_ids(self, document_id):
+        """Live chunk ids of one document."""
+        with self._lock:
+            self._refresh()
+            rows = self._db.execute(
+                "SELECT chunk_id FROM rows WHERE live = 1 AND document_id = ? ORDER BY row", (document_id,)
+            )
+            return [cid for (cid,) in rows]
+
+    def live_chunks(self):
+        """``(chunk id, document id)`` of every live row."""
+        with self._lock:
+            self._refresh()
+            return self._db.execute("SELECT chunk_id, document_id FROM rows WHERE live = 1 ORDER BY row").fetchall()
+
+    def compact(self):
+        """Rewrite the files without tombstoned rows; returns the number of rows dropped."""
+        with self._file_lock():
+            self._refresh()
+            keep = np.flatnonzero(self._live)
+            dropped = len(self._chunk_ids) - len(keep)
+            if not dropped:
+                return 0
+            arrays = [np.array(m[keep]) for m in self._memmaps()]
+            self._maps = None
+            for (name, _, _), array in zip(FILES, arrays):
+                tmp = self._file(name + ".tmp")
+                tmp.write_bytes(np.ascontiguousarray(array).tobytes())
+                os.replace(tmp, self._file(name))
+            rows = [
+                (new, self._chunk_ids[old], int(self._documents[old]), int(self._owners[old]))
+                for new, old in enumerate(keep)
+            ]
+            with self._db:
+                self._db.execute("DELETE FROM rows")
+                self._db.executemany(
+                    "INSERT INTO rows (row, chunk_id, document_id, owner_id) VALUES (?, ?, ?, ?)", rows
+                )
+            self._load_rows()
+            return dropped
+
+    # ---------- search ----------
+
+    def search(self, embedding, owner_id, document_ids=None, k=3, oversample=QUANT_OVERSAMPLE):
+        """Top-k ``{"id", "document_id", "score"}`` by cosine, re-ranked with exact vectors."""
+        with self._lock:
+            self._refresh()
+            n = len(self._chunk_ids)
+            if not n:
+                return []
+            mask = self._live & (self._owners == owner_id)
+            if document_ids:
+                mask &= np.isin(self._documents, np.asarray(document_ids, dtype=np.int32))
+            rows = np.flatnonzero(mask)
+            codes, scales, vectors = self._memmaps()
+            chunk_ids, documents = self._chunk_ids, self._documents
+        if not len(rows):
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        approx = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), SCAN_BLOCK_ROWS):
+            block = rows[start:start + SCAN_BLOCK_ROWS]
+            if block[-1] - block[0] + 1 == len(block):  # contiguous: slice the memmap instead of gathering
+                block_codes = codes[block[0]:block[-1] + 1]
+            else:
+                block_codes = codes[block]
+            approx[start:start + len(block)] = (block_codes.astype(np.float32) @ query) * scales[block]
+
+        n_candidates = min(len(rows), max(k * oversample, k))
+        if n_candidates < len(rows):
+            candidates = rows[np.argpartition(-approx, n_candidates - 1)[:n_candidates]]
+        else:
+            candidates = rows
+        candidates = np.sort(candidates)  # sequential reads from the exact-vector file
+        exact = vectors[candidates] @ query
+        order = np.argsort(-exact)[:k]
+        return [
+            {"id": chunk_ids[candidates[i]], "document_id": int(documents[candidates[i]]), "score": float(exact[i])}
+            for i in order
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_quantized_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = QuantizedIndex()
+    return _index
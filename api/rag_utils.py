@@ -1,59 +1,121 @@
-from pathlib import Path
-import os
+import xxhash
+from django.db import transaction
 from dotenv import load_dotenv
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from PyPDF2 import PdfReader
-import google.generativeai as genai
+
+from . import gemini_wrapper, vector_store
+from .chunking import chunk_pages
+from .embeddings import get_embedding_service
+from .extraction import iter_pages
+from .lexical_index import get_lexical_index
+from .models import Chunk
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-# Setup database directory
-DB_DIR = Path("db")
-DB_DIR.mkdir(exist_ok=True)
-
-# Load embeddings model
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-
-def get_chroma_vstore(doc_path: str):
-    """Return Chroma vector store for a document"""
-    return Chroma(persist_directory=doc_path, embedding_function=embeddings)
-
 
-def index_document(doc, file_path: str):
-    """Extract and store PDF content into Chroma vector DB"""
-    text = ""
-    reader = PdfReader(file_path)
-    for page in reader.pages:
-        text += page.extract_text() or ""
-
-    if not text.strip():
-        return ""
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.split_text(text)
-
-    doc_dir = DB_DIR / f"doc_{doc.id}"
-    doc_dir.mkdir(parents=True, exist_ok=True)
-
-    Chroma.from_texts(chunks, embeddings, persist_directory=str(doc_dir))
-    return text
+def extract_pages(file_path: str, on_page=None, shared=None):
+    """Extract text page by page (PyMuPDF → pdfplumber → OCR per page)"""
+    pages = []
+    for page_no, text, method in iter_pages(file_path, shared=shared):
+        pages.append(text)
+        if on_page:
+            on_page(page_no, method)
+    return pages
+
+
+def split_pages(pages, strategy=None):
+    """Lazily chunk a list of page texts with the configured strategy (see ``api.chunking``).
+
+    Yields ``{"text", "page", "start", "end"}``. The list is emptied as the
+    chunker takes pages from it, so each page is freed once it is chunked.
+    """
+    def drain():
+        pages.reverse()
+        while pages:
+            yield pages.pop()
+
+    return chunk_pages(drain(), strategy)
+
+
+def chunk_hash(text):
+    return xxhash.xxh3_128_hexdigest(text.encode("utf-8"))
+
+
+def plan_reindex(doc, chunks):
+    """Give chunks content-addressed ids and diff them against what is already indexed.
+
+    ``chunks`` may be a generator; each chunk gets ``position``, ``hash`` and
+    ``id`` as it arrives. Returns ``(chunks, fresh, kept, stale_ids)``: every
+    chunk, the ones that need embedding, the ones whose vectors can be
+    reused, and ids of vectors no longer in the document.
+    """
+    existing = set(vector_store.document_chunk_ids(doc.id))
+    planned, fresh, kept, seen = [], [], [], {}
+    for position, c in enumerate(chunks):
+        c["position"] = position
+        c["hash"] = chunk_hash(c["text"])
+        n = seen[c["hash"]] = seen.get(c["hash"], -1) + 1
+        # repeated identical chunks (boilerplate) get distinct ids
+        c["id"] = vector_store.chunk_id(doc.id, c["hash"] if n == 0 else f"{c['hash']}-{n}")
+        planned.append(c)
+        (kept if c["id"] in existing else fresh).append(c)
+
+    stale_ids = sorted(existing - {c["id"] for c in planned})
+    return planned, fresh, kept, stale_ids
+
+
+def embed_chunks(texts, on_batch=None):
+    """Embed chunk texts, skipping cached ones; returns (vectors, cache_hits)"""
+    return get_embedding_service().encode_cached(texts, on_batch=on_batch)
+
+
+def persist_chunks(doc, chunks, fresh, vectors, kept=(), stale_ids=()):
+    """Write a planned re-index to Chroma, the lexical index and the Chunk table
+
+    Only ``fresh`` chunks are upserted with ``vectors``; ``kept`` ones just get
+    their position refreshed and ``stale_ids`` are deleted.
+    """
+    vector_store.add_chunks(doc, fresh, vectors)
+    vector_store.update_positions(doc, kept)
+    vector_store.delete_chunks(stale_ids)
+    get_lexical_index().add_document(doc.id, doc.owner_id, [c["id"] for c in chunks], [c["text"] for c in chunks])
+
+    with transaction.atomic():
+        Chunk.objects.filter(document=doc).delete()
+        Chunk.objects.bulk_create(
+            [
+                Chunk(
+                    document=doc,
+                    position=c["position"],
+                    page=c.get("page"),
+                    start_offset=c.get("start"),
+                    end_offset=c.get("end"),
+                    text=c["text"],
+                    content_hash=c["hash"],
+                    chroma_id=c["id"],
+                )
+                for c in chunks
+            ],
+            batch_size=500,
+        )
+
+
+def build_prompt(question, context):
+    """Wrap retrieved context and the user question into the assistant prompt"""
+    return f"""
+You are an intelligent document assistant.
+Use only the context below to answer the question.
+
+Context:
+{context}
+
+Question:
+{question}
+
+Answer:
+"""
 
 
 def generate_answer(question, context):
     """Generate AI response using Gemini model"""
-    try:
-        model = genai.GenerativeModel("gemini-2.0-flash-lite")  # if this is available
-
-
-        prompt = f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        return f"⚠️ Error generating answer: {str(e)}"
+    return gemini_wrapper.generate_answer(f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:")
@@ -0,0 +1,115 @@
+"""Cross-encoder re-ranking on ONNX Runtime (CPU).
+
+Retrieval fetches a wide candidate set (``RERANK_CANDIDATES``) and a small
+cross-encoder scores each (question, chunk) pair jointly, which is far more
+precise than comparing independent embeddings. Pairs are scored in batches
+and the scores are cached per (question, chunk id); chunk ids are content
+hashes, so a cached score never outlives the text it was computed for.
+
+Off by default (``RERANKER=1`` enables it): the model is fetched from the
+Hugging Face hub on first use unless ``RERANKER_ONNX_PATH`` points at a
+local copy. If it can't be loaded the reranker disables itself and
+retrieval keeps its fused order.
+"""
+import os
+import threading
+
+import numpy as np
+import xxhash
+from cachetools import LRUCache
+
+RERANKER_ENABLED = os.getenv("RERANKER", "0") == "1"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANKER_ONNX_PATH = os.getenv("RERANKER_ONNX_PATH")  # optional local model.onnx
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_MAX_TOKENS = int(os.getenv("RERANK_MAX_TOKENS", "320"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+
+class CrossEncoder:
+    def __init__(self, session, tokenizer, batch_size=RERANK_BATCH_SIZE, max_tokens=RERANK_MAX_TOKENS):
+        self.session = session
+        self.tokenizer = tokenizer
+        # long passages are cut, never the question
+        self.tokenizer.enable_truncation(max_length=max_tokens, strategy="only_second")
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @classmethod
+    def load(cls, model_name=RERANKER_MODEL):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        model_path = RERANKER_ONNX_PATH or hf_hub_download(model_name, "onnx/model.onnx")
+        opts = ort.SessionOptions()
+        if ONNX_THREADS:
+            opts.intra_op_num_threads = ONNX_THREADS
+        session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        return cls(session, Tokenizer.from_pretrained(model_name))
+
+    def score(self, query, passages):
+        """Relevance logits for ``query`` against each passage."""
+        scores = []
+        for start in range(0, len(passages), self.batch_size):
+            batch = passages[start:start + self.batch_size]
+            encoded = self.tokenizer.encode_batch([(query, p) for p in batch])
+            feeds = {
+                "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encoded], dtype=np.int64),
+            }
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encoded], dtype=np.int64)
+            logits = self.session.run(None, feeds)[0]
+            scores.extend(logits.reshape(len(batch), -1)[:, 0].tolist())
+        return scores
+
+
+class Reranker:
+    def __init__(self, enabled=RERANKER_ENABLED, cache_size=RERANK_CACHE_SIZE):
+        self.enabled = enabled
+        self._model = None
+        self._cache = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None and self.enabled:
+            with self._lock:
+                if self._model is None and self.enabled:
+                    try:
+                        print(f"🧠 Loading reranker {RERANKER_MODEL}")
+                        self._model = CrossEncoder.load()
+                    except Exception as e:
+                        print(f"⚠️ Reranker unavailable, keeping retrieval order: {e}")
+                        self.enabled = False
+        return self._model
+
+    def rerank(self, question, hits, k):
+        """Return the top-k hits by cross-encoder score (``retrieval_score`` keeps the old one)."""
+        model = self.model
+        if model is None or not hits:
+            return hits[:k]
+
+        query_key = xxhash.xxh3_64_hexdigest(question.strip().lower())
+        with self._lock:
+            cached = {h["id"]: self._cache.get((query_key, h["id"])) for h in hits}
+        missing = [h for h in hits if cached[h["id"]] is None]
+        if missing:
+            scores = model.score(question, [h["text"] for h in missing])
+            with self._lock:
+                for h, s in zip(missing, scores):
+                    cached[h["id"]] = self._cache[(query_key, h["id"])] = s
+
+        ranked = [
+            dict(h, retrieval_score=h["score"], score=float(1.0 / (1.0 + np.exp(-cached[h["id"]]))))
+            for h in hits
+        ]
+        ranked.sort(key=lambda h: -h["score"])
+        return ranked[:k]
+
+
+reranker = Reranker()
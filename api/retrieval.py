@@ -0,0 +1,128 @@
+"""Retrieval entry point used by the ask views.
+
+Dense (vector) and lexical (BM25) candidates are fused with reciprocal rank
+fusion, then optionally re-ranked by a cross-encoder (``api.reranker``).
+Short keyword-style queries whose best BM25 hit scores at least
+``KEYWORD_QUERY_MIN_SCORE`` skip the embedding model entirely.
+"""
+import os
+
+from . import vector_store
+from .embeddings import get_embedding_service
+from .lexical_index import get_lexical_index, tokenize
+from .models import Chunk
+from .reranker import RERANK_CANDIDATES, reranker
+from .telemetry import span
+
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+RRF_K = int(os.getenv("RRF_K", "60"))
+CANDIDATE_MULTIPLIER = int(os.getenv("RETRIEVAL_CANDIDATE_MULTIPLIER", "4"))
+KEYWORD_QUERY_MAX_TERMS = int(os.getenv("KEYWORD_QUERY_MAX_TERMS", "2"))
+# BM25 score the top lexical hit needs before dense retrieval is skipped; rare
+# identifiers ("PART-4411") clear it easily, a couple of common words don't
+KEYWORD_QUERY_MIN_SCORE = float(os.getenv("KEYWORD_QUERY_MIN_SCORE", "10.0"))
+
+
+def embed_query(question):
+    return get_embedding_service().encode([question])[0]
+
+
+def is_keyword_query(question):
+    """A bare term or two (part numbers, clause ids) rather than a sentence or a question."""
+    question = question.strip()
+    return (
+        len(question.split()) <= KEYWORD_QUERY_MAX_TERMS
+        and not question.endswith("?")
+        and bool(tokenize(question))
+    )
+
+
+def needs_query_embedding(question):
+    """False for keyword queries that hybrid retrieval may answer from BM25 alone.
+
+    Callers that embed up front (to share the vector with the answer cache)
+    should skip it for these, or the lexical shortcut in ``retrieve`` never runs.
+    """
+    return not (HYBRID_RETRIEVAL and is_keyword_query(question))
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked hit lists; each hit's score becomes sum(1 / (k + rank))."""
+    fused = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            entry = fused.setdefault(hit["id"], dict(hit, score=0.0))
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda h: -h["score"])
+
+
+def retrieve(question, owner_id, document_ids=None, k=3, embedding=None, timings=None):
+    """Return the owner's top-k chunks for ``question``.
+
+    Pass ``embedding`` when the caller already embedded the question. With the
+    reranker enabled, ``RERANK_CANDIDATES`` fused hits are re-scored by the
+    cross-encoder and the best k kept. ``timings`` (a dict) receives
+    per-stage milliseconds.
+    """
+    depth = max(k, RERANK_CANDIDATES) if reranker.enabled else k
+
+    if not HYBRID_RETRIEVAL:
+        if embedding is None:
+            with span("retrieval.embed", timings):
+                embedding = embed_query(question)
+        with span("retrieval.dense", timings):
+            hits = vector_store.query(embedding, owner_id, document_ids, depth)
+    else:
+        with span("retrieval.lexical", timings):
+            lexical = get_lexical_index().search(question, owner_id, document_ids, k=depth * CANDIDATE_MULTIPLIER)
+
+        if (
+            embedding is None
+            and lexical
+            and lexical[0]["score"] >= KEYWORD_QUERY_MIN_SCORE
+            and is_keyword_query(question)
+        ):
+            hits = lexical[:depth]
+        else:
+            if embedding is None:
+                with span("retrieval.embed", timings):
+                    embedding = embed_query(question)
+            with span("retrieval.dense", timings):
+                dense = vector_store.query(embedding, owner_id, document_ids, depth * CANDIDATE_MULTIPLIER)
+            hits = reciprocal_rank_fusion([dense, lexical])[:depth]
+
+    with span("retrieval.hydrate", timings):
+        hits = attach_chunks(hits)
+    if reranker.enabled:
+        with span("retrieval.rerank", timings):
+            hits = reranker.rerank(question, hits, k)
+    return hits[:k]
+
+
+def attach_chunks(hits):
+    """Fill in text, page and offsets for the matched chunk ids from the Chunk table.
+
+    Chunks indexed before chunk rows were written fall back to the text stored
+    in Chroma.
+    """
+    rows = {
+        row["chroma_id"]: row
+        for row in Chunk.objects.filter(chroma_id__in=[h["id"] for h in hits]).values(
+            "chroma_id", "text", "page", "position", "start_offset", "end_offset"
+        )
+    }
+    for h in hits:
+        row = rows.get(h["id"])
+        if row:
+            h.update(
+                text=row["text"], page=row["page"], position=row["position"],
+                start=row["start_offset"], end=row["end_offset"],
+            )
+
+    missing = [h["id"] for h in hits if h["id"] not in rows]
+    if missing:
+        legacy = vector_store.get_chunks(missing)
+        for h in hits:
+            if h["id"] in legacy:
+                h["text"] = legacy[h["id"]]["text"]
+    return [h for h in hits if h.get("text")]
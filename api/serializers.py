@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Document, Chunk, ChatHistory
+from .models import Document, Chunk, ChatHistory, IngestionJob
 
 from django.contrib.auth.models import User
 from rest_framework import serializers
@@ -42,15 +42,34 @@ class LoginSerializer(serializers.Serializer):
 class ChunkSerializer(serializers.ModelSerializer):
     class Meta:
         model = Chunk
-        fields = "__all__"
+        fields = ["id", "position", "page", "start_offset", "end_offset", "text", "metadata", "created_at"]
+
+
+class DocumentListSerializer(serializers.ModelSerializer):
+    """Slim row for library listings: no text, no chunks."""
+    class Meta:
+        model = Document
+        fields = ["id", "title", "version", "created_at"]
+
 
 class DocumentSerializer(serializers.ModelSerializer):
-    chunks = ChunkSerializer(many=True, read_only=True)
+    # annotated by DocumentViewSet; chunks themselves live at /documents/<id>/chunks/
+    chunk_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Document
-        fields = ["id", "title", "file", "created_at", "chunks"]
+        fields = ["id", "title", "file", "version", "created_at", "chunk_count"]
 
 class ChatHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatHistory
         fields = "__all__"
+
+
+class IngestionJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IngestionJob
+        fields = [
+            "id", "document", "batch", "force", "status", "stage", "progress", "error", "created_at", "started_at",
+            "finished_at",
+        ]
@@ -0,0 +1,22 @@
+import shutil
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Document
+
+
+@receiver(post_delete, sender=Document)
+def remove_document_index(sender, instance, **kwargs):
+    """Drop a deleted document's vectors, lexical postings, cached answers and any legacy store."""
+    from . import vector_store
+    from .answer_cache import answer_cache
+    from .lexical_index import get_lexical_index
+
+    answer_cache.invalidate(instance.id)
+    try:
+        vector_store.delete_document(instance.id)
+        get_lexical_index().delete_document(instance.id)
+        shutil.rmtree(vector_store.LEGACY_DB_DIR / f"doc_{instance.id}", ignore_errors=True)
+    except Exception as e:
+        print(f"⚠️ Index cleanup failed for document {instance.id}: {e}")
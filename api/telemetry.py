@@ -0,0 +1,182 @@
+"""Tracing and metrics for the RAG path.
+
+Stages are wrapped in OpenTelemetry spans (``span("retrieval.dense")``). A
+span processor turns every finished span into a Prometheus histogram sample
+(``rag_stage_duration_seconds{stage=...}``), and ``TelemetryMiddleware``
+records request latency per route. ``metrics_view`` serves both in the
+Prometheus text format at ``/metrics``.
+
+Set ``OTEL_EXPORTER_OTLP_ENDPOINT`` to also ship spans to a collector.
+Clients can send ``X-Profile: 1`` to get the request's stage breakdown back
+in a ``Server-Timing`` header (disable with ``REQUEST_PROFILING=0``).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "doc-assistant")
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "1") == "1"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name, help_text, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, values in series:
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+            sep = "," if labels else ""
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_count{{{labels}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram("rag_stage_duration_seconds", "Duration of RAG pipeline stages.", ["stage", "status"])
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests by route.", ["method", "route", "status"]
+)
+HISTOGRAMS = [STAGE_SECONDS, REQUEST_SECONDS]
+
+# trace id -> [(span name, ms)] for requests that asked for a profile
+_profiles = {}
+
+
+class StageMetricsProcessor(SpanProcessor):
+    """Feeds finished spans into ``STAGE_SECONDS`` and any open request profile."""
+
+    def on_end(self, span):
+        if span.kind == SpanKind.SERVER:
+            return  # request spans are recorded per route by the middleware
+        seconds = (span.end_time - span.start_time) / 1e9
+        failed = span.status.status_code == StatusCode.ERROR
+        STAGE_SECONDS.observe(seconds, stage=span.name, status="error" if failed else "ok")
+        profile = _profiles.get(span.context.trace_id)
+        if profile is not None:
+            profile.append((span.name, seconds * 1000))
+
+
+def _provider():
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    provider.add_span_processor(StageMetricsProcessor())
+    if OTEL_EXPORTER_OTLP_ENDPOINT:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    return provider
+
+
+tracer = _provider().get_tracer("api")
+
+
+@contextmanager
+def span(name, timings=None, **attributes):
+    """Trace a stage; with ``timings`` (a dict) also store its ms under the last part of ``name``."""
+    started = time.perf_counter()
+    with tracer.start_as_current_span(name, attributes=attributes or None) as current:
+        try:
+            yield current
+        finally:
+            if timings is not None:
+                timings[name.rsplit(".", 1)[-1]] = round((time.perf_counter() - started) * 1000, 2)
+
+
+# ===============================
+# Middleware and /metrics
+# ===============================
+class TelemetryMiddleware:
+    """Root span and latency histogram per request, plus the opt-in ``X-Profile`` breakdown."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self._request_span(request) as finish:
+            return finish(self.get_response(request))
+
+    async def __acall__(self, request):
+        with self._request_span(request) as finish:
+            return finish(await self.get_response(request))
+
+    @contextmanager
+    def _request_span(self, request):
+        started = time.perf_counter()
+        with tracer.start_as_current_span(f"{request.method} {request.path}", kind=SpanKind.SERVER) as root:
+            trace_id = root.get_span_context().trace_id
+            profiling = REQUEST_PROFILING and request.META.get(PROFILE_HEADER) == "1"
+            if profiling:
+                _profiles[trace_id] = []
+
+            def finish(response):
+                seconds = time.perf_counter() - started
+                route = getattr(request.resolver_match, "route", None) or "unmatched"
+                root.update_name(f"{request.method} {route}")
+                root.set_attribute("http.route", route)
+                root.set_attribute("http.response.status_code", response.status_code)
+                if response.status_code >= 500:
+                    root.set_status(Status(StatusCode.ERROR))
+                REQUEST_SECONDS.observe(seconds, method=request.method, route=route, status=response.status_code)
+                if profiling:
+                    stages = _profiles.pop(trace_id, [])
+                    response["Server-Timing"] = ", ".join(
+                        [f'{name};dur={ms:.2f}' for name, ms in stages] + [f"total;dur={seconds * 1000:.2f}"]
+                    )
+                    response["X-Trace-Id"] = format(trace_id, "032x")
+                return response
+
+            try:
+                yield finish
+            finally:
+                _profiles.pop(trace_id, None)
+
+
+def metrics_view(request):
+    body = "\n".join(h.render() for h in HISTOGRAMS) + "\n"
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,3 +1,957 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import itertools
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+from functools import partial
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import fitz
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import extraction, vector_store
+from .chunking import PAGE_SEPARATOR, STRATEGIES, chunk_pages
+from .context import MIN_BLOCK_TOKENS, assemble_context, merge_hits, pack
+from .answer_cache import AnswerCache, answer_cache
+from .ingestion import enqueue_batch, enqueue_ingestion, run_batch, run_job
+from .async_utils import run_blocking
+from .embedding_cache import EmbeddingCache
+from .embeddings import EmbeddingService
+from .gemini_wrapper import ModelRouter, StreamInterrupted
+from .models import ChatHistory, Document, IngestionJob
+from .lexical_index import LexicalIndex
+from .quantized_index import QuantizedIndex
+from .rag_utils import split_pages
+from .reranker import CrossEncoder, Reranker
+from .retrieval import KEYWORD_QUERY_MIN_SCORE, is_keyword_query, retrieve
+from .vector_cache import ID_OVERHEAD_BYTES, DocumentVectorCache, _Entry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def word_count(text):
+    return len(text.split())
+
+
+class ChunkingTests(SimpleTestCase):
+    pages = [
+        "1. Scope\n\nThis manual covers the pump. It applies to all models sold after 2020.\n"
+        "Lines are hard wrapped\nin the middle of sentences. " + "Filler sentence with six words. " * 12,
+        "SAFETY NOTES\n\nDisconnect power first. Wear gloves! Check the seal?\n\n" + "More text follows here. " * 20,
+        "Appendix A\n\nA short last page.",
+    ]
+
+    def chunks(self, strategy, **options):
+        return list(chunk_pages(self.pages, strategy, count=word_count, budget=30, **options))
+
+    def test_offsets_point_into_the_joined_text(self):
+        joined = PAGE_SEPARATOR.join(self.pages)
+        page_starts = [joined.index(page) for page in self.pages]
+        for strategy in STRATEGIES:
+            chunks = self.chunks(strategy)
+            self.assertTrue(chunks, strategy)
+            for chunk in chunks:
+                self.assertEqual(joined[chunk["start"]:chunk["end"]], chunk["text"], strategy)
+                page = max(i for i, start in enumerate(page_starts, 1) if start <= chunk["start"])
+                self.assertEqual(chunk["page"], page, strategy)
+                self.assertLessEqual(word_count(chunk["text"]), 30, strategy)
+
+    def test_every_word_lands_in_a_chunk(self):
+        joined = PAGE_SEPARATOR.join(self.pages)
+        for strategy in STRATEGIES:
+            covered = [False] * len(joined)
+            for chunk in self.chunks(strategy):
+                covered[chunk["start"]:chunk["end"]] = [True] * (chunk["end"] - chunk["start"])
+            missed = "".join(c for c, hit in zip(joined, covered) if not hit)
+            self.assertEqual(missed.split(), [], strategy)
+
+    def test_structure_chunks_stay_within_a_page_and_start_at_headings(self):
+        joined = PAGE_SEPARATOR.join(self.pages)
+        page_starts = [joined.index(page) for page in self.pages]
+        chunks = self.chunks("structure")
+        for chunk in chunks:
+            last_page = max(i for i, start in enumerate(page_starts, 1) if start < chunk["end"])
+            self.assertEqual(last_page, chunk["page"])
+        starts = {chunk["text"].split("\n")[0] for chunk in chunks}
+        self.assertTrue({"1. Scope", "SAFETY NOTES", "Appendix A"} <= starts)
+
+    def test_ingestion_frees_pages_as_they_are_chunked(self):
+        pages = list(self.pages)
+        with mock.patch("api.rag_utils.chunk_pages", partial(chunk_pages, count=word_count)):
+            chunks = split_pages(pages)
+            self.assertEqual(len(pages), 3)  # nothing is read until the chunks are
+            first = next(chunks)
+            self.assertLess(len(pages), 3)
+            rest = list(chunks)
+        self.assertEqual(pages, [])
+        self.assertEqual([first, *rest], list(chunk_pages(self.pages, count=word_count)))
+
+    def test_blank_pages_yield_no_chunks(self):
+        for strategy in STRATEGIES:
+            self.assertEqual(list(chunk_pages(["  ", "\n\n"], strategy, count=word_count)), [], strategy)
+
+    def test_unknown_strategy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            list(chunk_pages(self.pages, "paragraphs", count=word_count))
+
+
+def sentences(prefix, n):
+    return " ".join(f"{prefix} number {i} ends here." for i in range(n))  # five words each
+
+
+class ContextPackingTests(SimpleTestCase):
+    text = "Alpha one. Beta two. Gamma three. Delta four. Epsilon five."
+
+    def hit(self, start, end, position, page=1, score=0.5, document_id=1):
+        return {"document_id": document_id, "text": self.text[start:end], "start": start, "end": end,
+                "position": position, "page": page, "score": score}
+
+    def test_overlapping_spans_are_merged_once(self):
+        [block] = merge_hits([self.hit(11, 33, 1, score=0.9), self.hit(0, 20, 0, score=0.4)])
+        self.assertEqual(block["text"], "Alpha one. Beta two. Gamma three.")
+        self.assertEqual((block["start"], block["end"], block["score"]), (0, 33, 0.9))
+
+    def test_neighbouring_chunks_merge_only_on_the_same_page(self):
+        [block] = merge_hits([self.hit(0, 10, 0), self.hit(21, 33, 1)])
+        self.assertEqual(block["text"], "Alpha one.\nGamma three.")
+        self.assertEqual(len(merge_hits([self.hit(0, 10, 0), self.hit(21, 33, 1, page=2)])), 2)
+        self.assertEqual(len(merge_hits([self.hit(0, 10, 0), self.hit(21, 33, 2)])), 2)
+
+    def test_legacy_chunks_drop_exact_duplicates(self):
+        legacy = {"document_id": 1, "text": "no offsets", "score": 0.3}
+        self.assertEqual(len(merge_hits([legacy, dict(legacy), self.hit(0, 10, 0)])), 2)
+
+    def test_packing_trims_the_last_block_and_stops_at_the_budget(self):
+        blocks = [
+            {"document_id": 1, "text": sentences("First", 12), "score": 0.9},   # 60 words
+            {"document_id": 1, "text": sentences("Second", 10), "score": 0.8},  # 50 words
+            {"document_id": 1, "text": sentences("Third", 2), "score": 0.7},
+        ]
+        kept = pack(blocks, budget=100, count=word_count)
+        self.assertEqual([b["tokens"] for b in kept], [60, 40])
+        self.assertTrue(kept[1]["trimmed"])
+        self.assertTrue(kept[1]["text"].endswith("ends here."))
+
+    def test_packing_stops_below_min_block_tokens(self):
+        blocks = [
+            {"document_id": 1, "text": sentences("First", 14), "score": 0.9},  # 70 words
+            {"document_id": 1, "text": sentences("Second", 2), "score": 0.8},
+        ]
+        kept = pack(blocks, budget=70 + MIN_BLOCK_TOKENS - 1, count=word_count)
+        self.assertEqual([b["tokens"] for b in kept], [70])
+
+    def test_multi_document_context_is_labelled_best_document_first(self):
+        hits = [self.hit(0, 10, 0, score=0.4), self.hit(34, 45, 3, score=0.2),
+                self.hit(21, 33, 2, score=0.9, document_id=2)]
+        context, blocks = assemble_context(hits, labels={1: "Lease", 2: "Manual"}, count=word_count)
+        self.assertEqual(context, "[Manual]\n\nGamma three.\n\n[Lease]\n\nAlpha one.\n\nDelta four.")
+        self.assertEqual([b["document_id"] for b in blocks], [2, 1, 1])
+
+
+class ModelRouterTests(SimpleTestCase):
+    def make_router(self, **kwargs):
+        self.clock = FakeClock()
+        options = {"threshold": 3, "cooldown": 30, "half_life": 60, "probe_interval": 30, "clock": self.clock}
+        options.update(kwargs)
+        return ModelRouter(models=["flash", "pro", "old"], **options)
+
+    def test_untried_models_keep_configured_order(self):
+        self.assertEqual(self.make_router().candidates(), ["flash", "pro", "old"])
+
+    def test_faster_model_goes_first(self):
+        router = self.make_router()
+        router.record_success("flash", 4.0)
+        router.record_success("pro", 1.0)
+        self.assertEqual(router.candidates()[0], "pro")
+
+    def test_breaker_opens_after_threshold_and_reopens_after_cooldown(self):
+        router = self.make_router()
+        for _ in range(3):
+            router.record_failure("flash", "boom")
+        self.assertNotIn("flash", router.candidates())
+        self.clock.now += 31
+        self.assertIn("flash", router.candidates())
+
+    def test_demoted_model_is_probed_and_recovers(self):
+        router = self.make_router()
+        router.record_failure("flash", "boom")
+        for _ in range(1000):
+            router.record_success("pro", 4.0)
+        self.assertEqual(router.candidates()[0], "pro")
+
+        self.clock.now += 31
+        self.assertEqual(router.candidates()[0], "flash")  # half-open probe, longest-idle model first
+        self.assertEqual(router.candidates()[0], "old")
+        self.assertEqual(router.candidates()[0], "pro")  # one probe per model per interval
+        router.record_success("flash", 1.0)
+        router.record_success("pro", 4.0)
+        self.assertEqual(router.candidates(), ["flash", "pro", "old"])
+
+    def test_error_rate_decays_over_time(self):
+        router = self.make_router()
+        router.record_failure("flash", "boom")
+        self.assertAlmostEqual(router.health["flash"].error_rate, 0.2)
+        self.clock.now += 60
+        router.candidates()
+        self.assertAlmostEqual(router.health["flash"].error_rate, 0.1)
+
+    def test_stream_failure_after_output_raises(self):
+        router = self.make_router()
+
+        async def broken_stream(name, prompt, timeout):
+            yield "partial"
+            raise ConnectionError("reset")
+
+        router._stream_one = broken_stream
+
+        async def consume():
+            return [piece async for piece in router.astream("prompt")]
+
+        with self.assertRaises(StreamInterrupted):
+            asyncio.run(consume())
+        self.assertEqual(router.health["flash"].errors, 1)
+
+
+class AnswerCacheTests(SimpleTestCase):
+    def test_exact_hit_ignores_case_and_punctuation(self):
+        cache = AnswerCache()
+        cache.put(1, 1, "What is the rent?", "100")
+        self.assertEqual(cache.get(1, 1, "what is the rent"), ("100", "exact"))
+
+    def test_new_document_version_misses(self):
+        cache = AnswerCache()
+        cache.put(1, 1, "What is the rent?", "100")
+        self.assertEqual(cache.get(1, 2, "What is the rent?"), (None, None))
+
+    def test_invalidate_drops_every_version(self):
+        cache = AnswerCache()
+        cache.put(1, 1, "q", "a")
+        cache.put(1, 2, "q", "b")
+        cache.put(2, 1, "q", "c")
+        cache.invalidate(1)
+        self.assertEqual(cache.get(1, 1, "q"), (None, None))
+        self.assertEqual(cache.get(1, 2, "q"), (None, None))
+        self.assertEqual(cache.get(2, 1, "q"), ("c", "exact"))
+
+    def test_error_messages_are_not_cached(self):
+        cache = AnswerCache()
+        cache.put(1, 1, "q", "❌ Gemini failed to generate a response.")
+        self.assertEqual(cache.get(1, 1, "q"), (None, None))
+
+    def test_semantic_tier_is_opt_in(self):
+        vector = [1.0, 0.0]
+        cache = AnswerCache()
+        cache.put(1, 1, "who signed the lease", "Ann", vector)
+        self.assertEqual(cache.get(1, 1, "who signed the contract", vector), (None, None))
+
+        cache = AnswerCache(semantic=True)
+        cache.put(1, 1, "who signed the lease", "Ann", vector)
+        self.assertEqual(cache.get(1, 1, "who signed the contract", vector), ("Ann", "semantic"))
+
+
+class CachedAnswerLookupTests(SimpleTestCase):
+    document = Document(id=10**6, version=1)
+
+    def lookup(self, question):
+        from .views import lookup_cached_answer
+
+        with mock.patch("api.views.embed_query", return_value=[1.0, 0.0]) as embed:
+            result = asyncio.run(lookup_cached_answer(self.document, question))
+        return result, embed.called
+
+    def test_keyword_query_is_not_embedded(self):
+        (answer, _, embedding), embedded = self.lookup("PART-4411")
+        self.assertIsNone(answer)
+        self.assertIsNone(embedding)
+        self.assertFalse(embedded)
+
+    def test_sentence_is_embedded_for_retrieval(self):
+        (_, _, embedding), embedded = self.lookup("Which parts ship with the pump?")
+        self.assertTrue(embedded)
+        self.assertEqual(embedding, [1.0, 0.0])
+
+
+class FakeEmbedder:
+    tokenizer = None
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), 1.0, 0.0, 0.0] for t in texts], dtype=np.float32)
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = EmbeddingCache(os.path.join(tempfile.mkdtemp(prefix="embed_cache_test_"), "cache.sqlite3"))
+        patcher = mock.patch("api.embeddings.get_embedding_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def service(self, model_name="model-a"):
+        service = EmbeddingService(model_name=model_name)
+        service._backend = FakeEmbedder()
+        return service
+
+    def test_only_misses_are_embedded(self):
+        service = self.service()
+        vectors, hits = service.encode_cached(["alpha", "beta", "alpha"])
+        self.assertEqual((hits, service.backend.calls), (0, [["alpha", "beta"]]))
+
+        again, hits = service.encode_cached(["beta", "alpha", "gamma"])
+        self.assertEqual((hits, service.backend.calls[1:]), (2, [["gamma"]]))
+        np.testing.assert_array_equal(again[:2], vectors[[1, 0]])
+
+    def test_entries_are_keyed_by_model(self):
+        self.service("model-a").encode_cached(["alpha"])
+        other = self.service("model-b")
+        _, hits = other.encode_cached(["alpha"])
+        self.assertEqual((hits, other.backend.calls), (0, [["alpha"]]))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.max_bytes = 10 * (4 * 4 + 16)  # room for ten 4-d vectors
+        statements = []
+        self.cache._conn().set_trace_callback(statements.append)
+        vector = np.ones(4, dtype=np.float32)
+        keys = [f"k{i}".encode() for i in range(15)]
+        with mock.patch("api.embedding_cache.time.time_ns", side_effect=itertools.count()):
+            for key in keys[:10]:
+                self.cache.put_many([(key, vector)])
+            self.cache.get_many(keys[:2])
+            for key in keys[10:]:
+                self.cache.put_many([(key, vector)])
+
+        self.assertEqual(sorted(self.cache.get_many(keys)), sorted(keys[:2] + keys[8:]))
+        self.assertLess(sum("COUNT(*)" in sql for sql in statements), 5)  # not once per write
+
+
+class KeywordShortcutTests(SimpleTestCase):
+    def retrieve(self, question, lexical_score):
+        lexical = mock.Mock()
+        lexical.search.return_value = [{"id": "a1", "document_id": 1, "score": lexical_score}]
+        with mock.patch("api.retrieval.get_lexical_index", return_value=lexical), \
+                mock.patch("api.retrieval.embed_query", return_value=[1.0, 0.0]) as embed, \
+                mock.patch("api.retrieval.vector_store.query", return_value=[]) as dense, \
+                mock.patch("api.retrieval.attach_chunks", side_effect=lambda hits: hits), \
+                mock.patch("api.retrieval.reranker.enabled", False):
+            hits = retrieve(question, 7, k=1)
+        return hits, embed.called and dense.called
+
+    def test_strong_lexical_hit_for_a_keyword_query_skips_dense(self):
+        hits, used_dense = self.retrieve("PART-4411", KEYWORD_QUERY_MIN_SCORE + 5)
+        self.assertEqual((hits[0]["id"], used_dense), ("a1", False))
+
+    def test_weak_lexical_hit_falls_back_to_dense(self):
+        self.assertTrue(self.retrieve("refund policy", KEYWORD_QUERY_MIN_SCORE - 1)[1])
+
+    def test_short_questions_are_not_keyword_queries(self):
+        self.assertFalse(is_keyword_query("refund policy?"))
+        self.assertTrue(self.retrieve("refund policy?", KEYWORD_QUERY_MIN_SCORE + 5)[1])
+
+
+class StubSession:
+    """Stands in for the ONNX session: a passage's logit is how often it says "refund"."""
+
+    def __init__(self, vocab):
+        self.refund = vocab["refund"]
+        self.feeds = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name=n) for n in ("input_ids", "attention_mask", "token_type_ids")]
+
+    def run(self, outputs, feeds):
+        self.feeds.append(feeds)
+        passage = feeds["input_ids"] * feeds["token_type_ids"]
+        return [(passage == self.refund).sum(axis=1, keepdims=True).astype(np.float32)]
+
+
+class RerankerTests(SimpleTestCase):
+    def setUp(self):
+        from tokenizers import Tokenizer, models, pre_tokenizers, processors
+
+        words = "[PAD] [UNK] [CLS] [SEP] refund policy shipping times the our is".split()
+        vocab = {w: i for i, w in enumerate(words)}
+        tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+        tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+        tokenizer.post_processor = processors.TemplateProcessing(
+            single="[CLS] $A [SEP]",
+            pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+            special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])],
+        )
+        self.session = StubSession(vocab)
+        self.reranker = Reranker(enabled=True)
+        self.reranker._model = CrossEncoder(self.session, tokenizer, batch_size=2, max_tokens=12)
+        self.hits = [
+            {"id": "a", "text": "shipping times", "score": 0.9},
+            {"id": "b", "text": "our refund policy", "score": 0.5},
+            {"id": "c", "text": "refund refund refund", "score": 0.1},
+        ]
+
+    def test_hits_are_reordered_by_cross_encoder_score(self):
+        ranked = self.reranker.rerank("refund policy", self.hits, k=3)
+        self.assertEqual([h["id"] for h in ranked], ["c", "b", "a"])
+        self.assertEqual([h["retrieval_score"] for h in ranked], [0.1, 0.5, 0.9])
+        self.assertEqual(len(self.session.feeds), 2)  # batches of two
+        self.assertEqual([h["id"] for h in self.reranker.rerank("refund", self.hits, k=1)], ["c"])
+
+    def test_long_passages_are_truncated_not_the_question(self):
+        hit = {"id": "long", "text": " ".join(["the refund is"] * 20), "score": 1.0}
+        self.reranker.rerank("refund policy", [hit], k=1)
+        ids = self.session.feeds[0]["input_ids"][0].tolist()
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(ids[:4], [2, 4, 5, 3])  # [CLS] refund policy [SEP]
+
+    def test_scores_are_cached_per_question_and_chunk(self):
+        self.reranker.rerank("refund policy", self.hits, k=3)
+        self.reranker.rerank("  Refund Policy ", self.hits, k=3)
+        self.assertEqual(len(self.session.feeds), 2)
+
+        fresh = {"id": "d", "text": "refund", "score": 0.2}
+        self.reranker.rerank("refund policy", self.hits + [fresh], k=4)
+        self.assertEqual(len(self.session.feeds), 3)
+        self.assertEqual(self.session.feeds[-1]["input_ids"].shape[0], 1)  # only the new hit
+
+
+class RunBlockingTests(SimpleTestCase):
+    def test_connections_are_recycled_around_each_call(self):
+        calls = []
+        with mock.patch("api.async_utils.close_old_connections", side_effect=lambda: calls.append("close")):
+            result = asyncio.run(run_blocking(lambda x: calls.append("call") or x * 2, 21))
+        self.assertEqual(result, 42)
+        self.assertEqual(calls, ["close", "call", "close"])
+
+    def test_connections_are_recycled_when_the_call_fails(self):
+        with mock.patch("api.async_utils.close_old_connections") as close:
+            with self.assertRaises(ZeroDivisionError):
+                asyncio.run(run_blocking(lambda: 1 / 0))
+        self.assertEqual(close.call_count, 2)
+
+
+class LexicalIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = LexicalIndex(os.path.join(tempfile.mkdtemp(prefix="lexical_test_"), "index.sqlite3"))
+        filler = ["pump housing bolts", "gasket seal torque", "valve spring seat"] * 10
+        self.index.add_document(1, 7, [f"a{i}" for i in range(30)], filler[:29] + ["replace part PART-4411 now"])
+        self.index.add_document(2, 7, ["b0", "b1"], ["PART-4411 PART-4411 listed twice", "unrelated"])
+        self.index.add_document(3, 8, ["c0"], ["PART-4411 belongs to someone else"])
+
+    def test_bm25_ranks_only_matching_chunks_of_the_owner(self):
+        hits = self.index.search("PART-4411", 7, k=10)
+        self.assertEqual([h["id"] for h in hits], ["b0", "a29"])
+        self.assertEqual(self.index.search("PART-4411", 7, [1]), [dict(hits[1])])
+
+    def test_reindex_replaces_a_document(self):
+        self.index.add_document(2, 7, ["b9"], ["nothing here"])
+        self.assertEqual([h["id"] for h in self.index.search("PART-4411", 7)], ["a29"])
+        self.index.delete_document(1)
+        self.assertEqual(self.index.search("PART-4411", 7), [])
+
+    def test_concurrent_writers_keep_document_frequencies_exact(self):
+        def reindex(seed):
+            index = LexicalIndex(self.index.path)  # own connection, like another process
+            for i in range(60):
+                index.add_document(10 + i % 3, 7, ["x0", "x1"], [f"alpha w{seed}x{i}", "alpha beta"])
+
+        threads = [threading.Thread(target=reindex, args=(seed,)) for seed in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        conn = self.index._conn()
+        postings = Counter()
+        for term, blob in conn.execute("SELECT term, data FROM postings"):
+            postings[term] += len(blob) // 8
+        self.assertEqual(dict(conn.execute("SELECT term, df FROM terms")), dict(postings))
+
+
+class StubVectorCache(DocumentVectorCache):
+    """Serves ``rows`` 4-dim vectors per document instead of reading Chroma."""
+
+    def __init__(self, max_bytes, rows):
+        super().__init__(max_bytes)
+        self.rows = rows
+        self.loads = []
+
+    def _load(self, document_id, version):
+        self.loads.append((document_id, version))
+        n = self.rows.get(document_id, 2)
+        matrix = np.full((n, 4), document_id, dtype=np.float32)
+        return _Entry(version, [f"{document_id}-{i}" for i in range(n)], matrix)
+
+
+class VectorCacheTests(SimpleTestCase):
+    ENTRY_BYTES = 2 * (4 * 4 + ID_OVERHEAD_BYTES)  # two rows of four float32s
+
+    def test_version_change_reloads_the_document(self):
+        cache = StubVectorCache(10 * self.ENTRY_BYTES, {})
+        cache.get(1, 1)
+        cache.get(1, 1)
+        cache.get(1, 2)
+        self.assertEqual(cache.loads, [(1, 1), (1, 2)])
+        self.assertEqual(cache.stats()["bytes"], self.ENTRY_BYTES)  # replaced, not counted twice
+
+    def test_least_recently_used_document_is_evicted(self):
+        cache = StubVectorCache(2 * self.ENTRY_BYTES, {})
+        cache.get(1, 1)
+        cache.get(2, 1)
+        cache.get(1, 1)  # 2 is now the least recently used
+        cache.get(3, 1)
+        self.assertEqual(list(cache._entries), [1, 3])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_oversized_document_is_served_without_flushing_the_cache(self):
+        cache = StubVectorCache(2 * self.ENTRY_BYTES, {9: 100})
+        cache.get(1, 1)
+        cache.get(2, 1)
+        self.assertEqual(len(cache.get(9, 1).ids), 100)
+        self.assertEqual(list(cache._entries), [1, 2])
+        self.assertEqual(cache.stats()["bytes"], 2 * self.ENTRY_BYTES)
+
+    def test_warm_up_runs_on_lifespan_startup_not_on_import(self):
+        import backend.asgi
+
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        with mock.patch("api.vector_cache.warm_in_background") as warm:
+            importlib.reload(backend.asgi)
+            warm.assert_not_called()
+            asyncio.run(backend.asgi.application({"type": "lifespan"}, receive, send))
+        warm.assert_called_once_with()
+        self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+
+
+class QuantizedIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="quant_index_test_")
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(40, 16)).astype(np.float32)
+        self.vectors /= np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.ids = [f"c{i}" for i in range(40)]
+
+    def test_round_trip_finds_each_vector(self):
+        index = QuantizedIndex(self.path)
+        index.add(1, 7, self.ids[:20], self.vectors[:20])
+        index.add(2, 7, self.ids[20:], self.vectors[20:])
+        for i in (0, 19, 20, 39):
+            self.assertEqual(index.search(self.vectors[i], 7, k=1)[0]["id"], self.ids[i])
+        self.assertEqual(index.search(self.vectors[0], 8), [])
+        self.assertEqual({h["document_id"] for h in index.search(self.vectors[0], 7, [2], k=5)}, {2})
+
+        reopened = QuantizedIndex(self.path)
+        self.assertEqual(reopened.search(self.vectors[25], 7, k=1)[0]["id"], "c25")
+
+    def test_delete_and_compact(self):
+        index = QuantizedIndex(self.path)
+        index.add(1, 7, self.ids[:20], self.vectors[:20])
+        index.add(2, 7, self.ids[20:], self.vectors[20:])
+        index.delete_document(1)
+        self.assertNotIn("c3", [h["id"] for h in index.search(self.vectors[3], 7, k=40)])
+        self.assertEqual(index.compact(), 20)
+        self.assertEqual(index.search(self.vectors[30], 7, k=1)[0]["id"], "c30")
+        self.assertEqual(len(index.search(self.vectors[30], 7, k=40)), 20)
+
+    def test_writers_sharing_the_files_do_not_overlap(self):
+        api, worker = QuantizedIndex(self.path), QuantizedIndex(self.path)  # e.g. server + ingest_worker
+        api.add(1, 7, self.ids[:10], self.vectors[:10])
+        worker.add(2, 7, self.ids[10:20], self.vectors[10:20])
+        api.add(3, 7, self.ids[20:30], self.vectors[20:30])
+        for index in (api, worker):
+            for i in (0, 15, 25):
+                self.assertEqual(index.search(self.vectors[i], 7, k=1)[0]["id"], self.ids[i])
+
+        worker.delete_document(2)
+        self.assertEqual(worker.compact(), 10)
+        self.assertEqual(api.search(self.vectors[25], 7, k=1)[0]["id"], "c25")
+        self.assertNotIn("c15", [h["id"] for h in api.search(self.vectors[15], 7, k=30)])
+
+
+    def test_quantized_mode_replaces_chroma(self):
+        index = QuantizedIndex(self.path)
+        document = Document(id=1, owner_id=7)
+        chunks = [{"id": cid, "text": cid, "position": i} for i, cid in enumerate(self.ids[:5])]
+        with mock.patch.object(vector_store, "VECTOR_INDEX", "quantized"), \
+                mock.patch.object(vector_store, "_quantized", return_value=index), \
+                mock.patch.object(vector_store, "get_collection", side_effect=AssertionError("Chroma used")):
+            vector_store.add_chunks(document, chunks, self.vectors[:5])
+            vector_store.update_positions(document, chunks)
+            self.assertEqual(vector_store.document_chunk_ids(1), self.ids[:5])
+            self.assertEqual(vector_store.query(self.vectors[2], 7, [1], k=1)[0]["id"], "c2")
+            vector_store.delete_chunks(["c2"])
+            vector_store.delete_document(1)
+            self.assertEqual(list(vector_store.iter_chunk_ids()), [])
+
+
+class WorkerFileTests(SimpleTestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="extract_test_"), "doc.pdf")
+        self.addCleanup(extraction._release_worker_file)
+
+    def write_pdf(self, text, path=None):
+        pdf = fitz.open()
+        pdf.new_page().insert_text((72, 72), text)
+        pdf.save(path or self.path)
+        pdf.close()
+
+    def test_replaced_file_is_remapped(self):
+        self.write_pdf("The first version of this page has enough text.")
+        self.assertIn("first version", extraction.extract_page(self.path, 0)[1])
+        self.write_pdf("The second version of this page has enough text.", self.path + ".new")
+        os.replace(self.path + ".new", self.path)
+        self.assertIn("second version", extraction.extract_page(self.path, 0)[1])
+
+    def test_mapping_is_released_when_idle(self):
+        self.write_pdf("A page with enough text to skip the OCR fallback.")
+        with mock.patch.object(extraction, "WORKER_FILE_IDLE", 0.05):
+            extraction.extract_page(self.path, 0)
+            self.assertIsNotNone(extraction._worker_file)
+            time.sleep(0.3)
+        self.assertIsNone(extraction._worker_file)
+
+
+class ChatHistoryPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("reader")
+        self.document = Document.objects.create(owner=self.user, title="doc", file="doc.txt")
+        self.headers = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        chats = [ChatHistory.objects.create(document=self.document, question=f"q{i}", answer="a" * 300) for i in range(7)]
+        # three chats share a timestamp, so the id tie-break has to hold across a page boundary
+        tied = timezone.now()
+        ChatHistory.objects.filter(id__in=[c.id for c in chats[2:5]]).update(created_at=tied)
+        self.expected = [c.id for c in sorted(
+            ChatHistory.objects.filter(document=self.document), key=lambda c: (c.created_at, c.id), reverse=True
+        )]
+
+    def get(self, **params):
+        return self.client.get(f"/api/chats/{self.document.id}/", params, headers=self.headers)
+
+    def test_pages_walk_every_chat_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            body = self.get(limit=2, **({"cursor": cursor} if cursor else {})).json()
+            self.assertLessEqual(len(body["results"]), 2)
+            seen.extend(row["id"] for row in body["results"])
+            cursor = body["next"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_summary_truncates_answers(self):
+        row = self.get(summary=1, limit=1).json()["results"][0]
+        self.assertEqual(len(row["answer"]), 200)
+        self.assertTrue(row["truncated"])
+
+    def test_bad_cursor_is_rejected(self):
+        self.assertEqual(self.get(cursor="not-a-cursor").status_code, 400)
+
+    def test_other_users_see_nothing_and_cannot_delete(self):
+        other = User.objects.create_user("other")
+        headers = {"Authorization": f"Bearer {RefreshToken.for_user(other).access_token}"}
+        body = self.client.get(f"/api/chats/{self.document.id}/", headers=headers).json()
+        self.assertEqual(body["results"], [])
+        response = self.client.post(
+            "/api/chats/delete/", {"ids": self.expected}, content_type="application/json", headers=headers
+        )
+        self.assertEqual(response.json()["deleted"], 0)
+        response = self.client.post(
+            "/api/chats/delete/", {"ids": self.expected[:3]}, content_type="application/json", headers=self.headers
+        )
+        self.assertEqual(response.json()["deleted"], 3)
+
+
+class AskStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("reader")
+        self.document = Document.objects.create(owner=self.user, title="doc", file="doc.txt")
+        answer_cache.invalidate(self.document.id)  # ids are reused across rolled-back tests
+        self.headers = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    async def stream(self, pieces, error=None):
+        async def fake_stream(prompt):
+            for piece in pieces:
+                yield piece
+            if error:
+                raise error
+
+        with mock.patch("api.views.lookup_cached_answer", mock.AsyncMock(return_value=(None, None, None))), \
+                mock.patch("api.views.build_context", return_value="context"), \
+                mock.patch("api.views.astream_answer", fake_stream):
+            response = await self.async_client.post(
+                "/api/ask/stream/", {"document_id": self.document.id, "question": "why?"},
+                content_type="application/json", headers=self.headers,
+            )
+            return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+    async def test_completed_stream_is_saved_and_cached(self):
+        body = await self.stream(["Because ", "reasons."])
+        self.assertIn("event: done", body)
+        self.assertEqual(await ChatHistory.objects.filter(document=self.document).acount(), 1)
+        self.assertEqual(answer_cache.get(self.document.id, self.document.version, "why?")[0], "Because reasons.")
+
+    async def test_interrupted_stream_ends_with_error_event(self):
+        body = await self.stream(["Because "], StreamInterrupted("reset"))
+        self.assertIn("event: error", body)
+        self.assertIn('"truncated": true', body)
+        self.assertNotIn("event: done", body)
+        self.assertEqual(await ChatHistory.objects.filter(document=self.document).acount(), 0)
+        self.assertEqual(answer_cache.get(self.document.id, self.document.version, "why?"), (None, None))
+
+
+class BatchAskTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("reader")
+        self.document = Document.objects.create(owner=self.user, title="doc", file="doc.txt")
+        answer_cache.invalidate(self.document.id)
+        self.headers = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    async def test_failed_question_does_not_fail_the_batch(self):
+        async def generate(prompt):
+            if "broken" in prompt:
+                raise RuntimeError("model overloaded")
+            return "fine"
+
+        with mock.patch("api.views.needs_query_embedding", return_value=False), \
+                mock.patch("api.views.build_context", side_effect=lambda doc, question, embedding: question), \
+                mock.patch("api.views.agenerate_answer", generate):
+            response = await self.async_client.post(
+                "/api/ask/batch/", {"document_id": self.document.id, "questions": ["ok one", "broken", "ok two"]},
+                content_type="application/json", headers=self.headers,
+            )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r.get("answer") for r in results], ["fine", None, "fine"])
+        self.assertEqual(results[1]["question"], "broken")
+        self.assertIn("error", results[1])
+        self.assertEqual(await ChatHistory.objects.filter(document=self.document).acount(), 2)
+
+
+class LibraryAskTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("reader")
+        self.headers = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    def ask(self, **data):
+        return self.client.post(
+            "/api/ask/library/", {"question": "why?", **data}, content_type="application/json", headers=self.headers
+        )
+
+    def test_k_below_one_is_rejected_before_searching(self):
+        with mock.patch("api.views.retrieve") as retrieve:
+            for k in (0, -3):
+                response = self.ask(k=k)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": "k must be at least 1"})
+        retrieve.assert_not_called()
+
+    def test_k_is_capped(self):
+        with mock.patch("api.views.retrieve", return_value=[]) as retrieve:
+            self.assertEqual(self.ask(k=500).status_code, 404)
+        self.assertEqual(retrieve.call_args.kwargs["k"], 20)
+
+
+class BatchUploadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="media_test_")
+        self.settings_override = override_settings(MEDIA_ROOT=self.media, UPLOAD_TEMP_DIR=self.media)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = User.objects.create_user("uploader")
+        self.headers = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    def archive(self, members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, data in members.items():
+                zf.writestr(name, data)
+        return SimpleUploadedFile("batch.zip", buffer.getvalue(), content_type="application/zip")
+
+    def stored_files(self):
+        return sorted(os.listdir(os.path.join(self.media, "documents")))
+
+    def upload(self, data):
+        return self.client.post("/api/upload/batch/", data, headers=self.headers)
+
+    def test_files_and_archive_members_share_one_batch(self):
+        response = self.upload({
+            "files": [SimpleUploadedFile("a.txt", b"alpha"), SimpleUploadedFile("b.txt", b"beta")],
+            "archive": self.archive({"c.txt": b"gamma", "__MACOSX/._c.txt": b"", "docs/d.txt": b"delta"}),
+        })
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual([j["title"] for j in body["jobs"]], ["a.txt", "b.txt", "c.txt", "d.txt"])
+        jobs = IngestionJob.objects.filter(batch=body["batch"])
+        self.assertEqual(jobs.count(), 4)
+        self.assertTrue(all(job.status == IngestionJob.QUEUED for job in jobs))
+        self.assertEqual(self.stored_files(), ["a.txt", "b.txt", "c.txt", "d.txt"])
+
+        status = self.client.get(f"/api/jobs/batch/{body['batch']}/", headers=self.headers).json()
+        self.assertEqual(status["status"], {IngestionJob.QUEUED: 4})
+
+    def test_oversized_archive_member_is_skipped(self):
+        with override_settings(UPLOAD_MAX_BYTES=1000):  # the archive itself compresses to well under this
+            response = self.upload({"archive": self.archive({"small.txt": b"ok", "big.txt": b"x" * 5000})})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual([j["title"] for j in response.json()["jobs"]], ["small.txt"])
+        self.assertEqual(response.json()["skipped"], [{"name": "big.txt", "error": "File too large"}])
+
+    def test_failed_enqueue_removes_stored_files(self):
+        with mock.patch("api.views.enqueue_batch", side_effect=RuntimeError("queue down")):
+            with self.assertRaises(RuntimeError):
+                self.upload({"files": [SimpleUploadedFile("a.txt", b"alpha"), SimpleUploadedFile("b.txt", b"b")]})
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(Document.objects.filter(owner=self.user).exists())
+
+
+@contextmanager
+def fake_indexing(embedded, persisted):
+    """Run ingestion with a fake embedder and no vector stores; records batch sizes and persisted vectors."""
+    def embed(texts, on_batch=None):
+        embedded.append(len(texts))
+        return np.ones((len(texts), 4), dtype=np.float32), 0
+
+    def persist(doc, chunks, fresh, vectors, kept=(), stale_ids=()):
+        persisted[doc.id] = len(vectors)
+
+    with mock.patch("api.rag_utils.vector_store.document_chunk_ids", return_value=[]), \
+            mock.patch("api.rag_utils.chunk_pages", partial(chunk_pages, count=word_count)), \
+            mock.patch("api.ingestion.embed_chunks", embed), \
+            mock.patch("api.ingestion.persist_chunks", persist):
+        yield
+
+
+class IngestTestCase(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp(prefix="media_test_")
+        self.settings_override = override_settings(MEDIA_ROOT=media)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = User.objects.create_user("ingester")
+
+    def document(self, name, text):
+        doc = Document(owner=self.user, title=name)
+        doc.file.save(name, ContentFile(text.encode()), save=True)
+        return doc
+
+
+@override_settings(INGEST_INLINE=False)
+class IngestionJobTests(IngestTestCase):
+    def run_job(self, job):
+        with fake_indexing([], {}):
+            ran = run_job(job.id)
+        job.refresh_from_db()
+        return ran
+
+    def test_job_moves_from_queued_to_done(self):
+        job = enqueue_ingestion(self.document("a.txt", "Alpha one. Alpha two."))
+        self.assertEqual(job.status, IngestionJob.QUEUED)
+        self.assertTrue(self.run_job(job))
+        self.assertEqual((job.status, job.stage, job.error), (IngestionJob.DONE, "persist", ""))
+        self.assertEqual({p["status"] for p in job.progress.values()}, {"done"})
+        self.assertLessEqual(job.started_at, job.finished_at)
+        self.assertFalse(self.run_job(job))  # a finished job can't be claimed again
+
+    def test_missing_file_fails_the_extract_stage(self):
+        doc = self.document("gone.txt", "soon gone")
+        os.remove(doc.file.path)
+        job = enqueue_ingestion(doc)
+        self.assertTrue(self.run_job(job))
+        self.assertEqual((job.status, job.stage), (IngestionJob.FAILED, "extract"))
+        self.assertEqual(job.progress["extract"]["status"], "failed")
+        self.assertEqual(job.progress["chunk"]["status"], "pending")
+        self.assertNotIn("", job.progress)
+        self.assertTrue(job.error)
+
+    def test_unchanged_file_is_skipped_unless_reindex_forces_it(self):
+        doc = self.document("a.txt", "Alpha one. Alpha two.")
+        self.run_job(enqueue_ingestion(doc))
+        job = enqueue_ingestion(doc)
+        self.run_job(job)
+        self.assertTrue(job.progress["extract"]["unchanged"])
+        self.assertEqual(job.progress["embed"]["status"], "skipped")
+
+        token = RefreshToken.for_user(self.user).access_token
+        response = self.client.post(f"/api/documents/{doc.id}/reindex/", headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(response.status_code, 202)
+        job = IngestionJob.objects.get(id=response.json()["job_id"])
+        self.assertTrue(job.force)
+        self.run_job(job)
+        self.assertNotIn("unchanged", job.progress["extract"])
+        self.assertEqual((job.status, job.progress["chunk"]["chunks"]), (IngestionJob.DONE, 1))
+
+    def test_status_endpoint_is_owner_only(self):
+        job = enqueue_ingestion(self.document("a.txt", "Alpha."))
+        self.run_job(job)
+        url = f"/api/jobs/{job.id}/"
+        token = RefreshToken.for_user(self.user).access_token
+        body = self.client.get(url, headers={"Authorization": f"Bearer {token}"}).json()
+        self.assertEqual((body["id"], body["status"], body["stage"]), (job.id, IngestionJob.DONE, "persist"))
+        self.assertEqual(body["progress"]["embed"]["status"], "done")
+
+        other = RefreshToken.for_user(User.objects.create_user("other")).access_token
+        self.assertEqual(self.client.get(url, headers={"Authorization": f"Bearer {other}"}).status_code, 404)
+
+
+@override_settings(INGEST_INLINE=False)
+class BatchIngestTests(IngestTestCase):
+
+    def run_batch(self, documents):
+        _, jobs = enqueue_batch(documents)
+        embedded, persisted = [], {}
+        with fake_indexing(embedded, persisted):
+            ran = run_batch([job.id for job in jobs])
+        return ran, jobs, embedded, persisted
+
+    def test_documents_share_one_embed_call(self):
+        docs = [self.document("a.txt", "Alpha one. Alpha two."), self.document("b.txt", "Beta one.")]
+        ran, jobs, embedded, persisted = self.run_batch(docs)
+        self.assertEqual(ran, 2)
+        self.assertEqual(len(embedded), 1)
+        self.assertEqual(sum(persisted.values()), embedded[0])
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual(job.status, IngestionJob.DONE)
+            self.assertEqual(job.progress["embed"]["shared_with"], 1)
+        self.assertEqual([d.version for d in Document.objects.filter(id__in=[d.id for d in docs])], [1, 1])
+
+    def test_one_broken_document_fails_alone(self):
+        good = self.document("good.txt", "Some readable text here.")
+        broken = self.document("broken.txt", "soon gone")
+        os.remove(broken.file.path)
+        ran, jobs, _, persisted = self.run_batch([good, broken])
+        statuses = {job.document_id: IngestionJob.objects.get(id=job.id).status for job in jobs}
+        self.assertEqual(statuses, {good.id: IngestionJob.DONE, broken.id: IngestionJob.FAILED})
+        self.assertEqual(list(persisted), [good.id])
+
+    def test_jobs_already_claimed_are_skipped(self):
+        doc = self.document("a.txt", "Alpha.")
+        _, jobs = enqueue_batch([doc])
+        IngestionJob.objects.filter(id=jobs[0].id).update(status=IngestionJob.RUNNING)
+        self.assertEqual(run_batch([jobs[0].id]), 0)
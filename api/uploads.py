@@ -0,0 +1,130 @@
+"""Streaming upload handling.
+
+Uploads are written to disk chunk by chunk as they arrive, hashed on the fly
+and cut off at ``UPLOAD_MAX_BYTES``. The temporary file lives next to the
+media directory, so saving the ``Document`` renames it into place instead of
+copying it, and ingestion gets the content hash without reading the file.
+"""
+import hashlib
+import os
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+class HashedUploadedFile(TemporaryUploadedFile):
+    """A streamed-to-disk upload in ``UPLOAD_TEMP_DIR`` that knows its sha256."""
+
+    sha256 = None
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix=".upload" + ext, dir=settings.UPLOAD_TEMP_DIR)
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+
+
+class HashingUploadHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = HashedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.digest = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            self.request.upload_too_large = True
+            self.upload_interrupted()
+            raise StopUpload(connection_reset=False)
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, "file"):
+            temp_location = self.file.temporary_file_path()
+            try:
+                self.file.close()
+                os.remove(temp_location)
+            except FileNotFoundError:
+                pass
+
+
+def upload_too_large(request, limit=None):
+    """True if the upload was (or will be) rejected for exceeding ``UPLOAD_MAX_BYTES``.
+
+    Checks the declared Content-Length against ``limit`` (default
+    ``UPLOAD_MAX_BYTES``) first so oversized bodies are refused before any of
+    them is parsed.
+    """
+    request = getattr(request, "_request", request)  # DRF Request → HttpRequest
+    try:
+        declared = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        declared = 0
+    if declared > (limit or settings.UPLOAD_MAX_BYTES):
+        return True
+    request.FILES  # noqa: B018 - parse the body now so the handler can flag it
+    return getattr(request, "upload_too_large", False)
+
+
+def save_to_storage(field, f, name):
+    """Store ``f`` the way ``field`` would on model save; returns the stored name.
+
+    Lets a caller write files before opening a transaction. Streamed uploads
+    are renamed into place rather than copied.
+    """
+    return field.storage.save(field.generate_filename(None, name), f, max_length=field.max_length)
+
+
+def delete_from_storage(field, names):
+    for name in names:
+        try:
+            field.storage.delete(name)
+        except OSError as e:
+            print(f"⚠️ Could not remove {name}: {e}")
+
+
+def iter_archive(upload, max_files):
+    """Validate an uploaded zip and return an iterator of ``(name, file, error)`` per regular file.
+
+    Members are streamed out of the archive rather than extracted to disk.
+    Members over ``UPLOAD_MAX_BYTES`` (by their declared size, which the zip
+    reader also enforces) come back with an error instead of a file. Raises
+    ``ValueError`` up front for a corrupt archive or more than ``max_files``
+    members.
+    """
+    try:
+        archive = zipfile.ZipFile(upload)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Not a valid zip archive: {e}")
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+        and not os.path.basename(info.filename).startswith(".")
+    ]
+    if len(members) > max_files:
+        raise ValueError(f"Archive has {len(members)} files; the limit is {max_files}")
+    return _archive_files(archive, members)
+
+
+def _archive_files(archive, members):
+    for info in members:
+        name = os.path.basename(info.filename)
+        if info.file_size > settings.UPLOAD_MAX_BYTES:
+            yield name, None, "File too large"
+            continue
+        with archive.open(info) as member:
+            f = File(member, name=name)
+            f.size = info.file_size
+            yield name, f, None
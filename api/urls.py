@@ -2,11 +2,12 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     RegisterView, LoginView,
-    UploadDocumentView, AskQuestionView, ChatHistoryView,
+    UploadDocumentView, BatchUploadView, IngestionJobView, IngestionBatchView,
+    AskQuestionView, BatchAskView, LibraryAskView, ChatHistoryView,
     DocumentViewSet
 )
 from django.urls import path
-from .views import delete_chat
+from .views import ChatDeleteView, ChatBulkDeleteView, AskStreamView
 
 router = DefaultRouter()
 router.register(r'documents', DocumentViewSet, basename='documents')
@@ -16,9 +17,16 @@ urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('auth/login/', LoginView.as_view(), name='login'),
     path('upload/', UploadDocumentView.as_view(), name='upload'),
+    path('upload/batch/', BatchUploadView.as_view(), name='upload_batch'),
+    path('jobs/<int:job_id>/', IngestionJobView.as_view(), name='ingestion_job'),
+    path('jobs/batch/<str:batch>/', IngestionBatchView.as_view(), name='ingestion_batch'),
     path('ask/', AskQuestionView.as_view(), name='ask'),
+    path('ask/batch/', BatchAskView.as_view(), name='ask_batch'),
+    path('ask/stream/', AskStreamView.as_view(), name='ask_stream'),
+    path('ask/library/', LibraryAskView.as_view(), name='ask_library'),
     path('chats/<int:document_id>/', ChatHistoryView.as_view(), name='chat_history'),
-       path('chats/<int:chat_id>/delete/', delete_chat, name='delete_chat'),
+       path('chats/<int:chat_id>/delete/', ChatDeleteView.as_view(), name='delete_chat'),
+    path('chats/delete/', ChatBulkDeleteView.as_view(), name='bulk_delete_chats'),
     path('', include(router.urls)),  # ✅ add this to include the new /api/documents/
 
 ]
@@ -0,0 +1,177 @@
+"""In-memory cache of hot documents' vectors for document-scoped queries.
+
+Asks are scoped to one (or a few) documents and traffic is skewed towards a
+few hundred recently active ones. For those, a brute-force dot product over
+the document's vectors held in RAM is exact and much faster than a filtered
+HNSW query against the shared Chroma collection.
+
+Entries are per document, evicted LRU once ``VECTOR_CACHE_MB`` is used,
+tagged with ``Document.version`` (so a re-index by another process is
+noticed on the next query) and dropped right away when this process writes
+or deletes the document's vectors. ``warm()`` preloads the documents with
+the most recent chat activity.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Max
+from django.utils import timezone
+
+VECTOR_CACHE_MB = int(os.getenv("VECTOR_CACHE_MB", "256"))  # 0 disables the cache
+VECTOR_CACHE_MAX_QUERY_DOCS = int(os.getenv("VECTOR_CACHE_MAX_QUERY_DOCS", "32"))
+VECTOR_CACHE_WARM_DOCS = int(os.getenv("VECTOR_CACHE_WARM_DOCS", "200"))
+VECTOR_CACHE_WARM_DAYS = int(os.getenv("VECTOR_CACHE_WARM_DAYS", "7"))
+ID_OVERHEAD_BYTES = 100  # rough per-row cost of the chunk id string and list slot
+
+
+class _Entry:
+    __slots__ = ("version", "ids", "matrix", "nbytes")
+
+    def __init__(self, version, ids, matrix):
+        self.version = version
+        self.ids = ids
+        self.matrix = matrix
+        self.nbytes = matrix.nbytes + len(ids) * ID_OVERHEAD_BYTES
+
+
+class DocumentVectorCache:
+    def __init__(self, max_bytes=VECTOR_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # document id -> _Entry, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _load(self, document_id, version):
+        from .vector_store import get_collection
+
+        result = get_collection().get(where={"document_id": document_id}, include=["embeddings"])
+        ids = result["ids"]
+        matrix = np.asarray(result["embeddings"], dtype=np.float32).reshape(len(ids), -1)
+        return _Entry(version, ids, matrix)
+
+    def get(self, document_id, version):
+        """The document's cached vectors, loading them on a miss or version change."""
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(document_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = self._load(document_id, version)
+        if entry.nbytes > self.max_bytes:
+            return entry  # serve this query, but never let one document flush the cache
+        with self._lock:
+            old = self._entries.pop(document_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[document_id] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, document_id):
+        with self._lock:
+            entry = self._entries.pop(document_id, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+
+    def search(self, embedding, owner_id, document_ids, k=3):
+        """Exact top-k ``{"id", "document_id", "score"}`` across the owner's ``document_ids``."""
+        from .models import Document
+
+        documents = Document.objects.filter(id__in=document_ids, owner_id=owner_id).values_list("id", "version")
+        query = np.asarray(embedding, dtype=np.float32)
+        candidates = []
+        for document_id, version in documents:
+            entry = self.get(document_id, version)
+            if not entry.ids:
+                continue
+            scores = entry.matrix @ query
+            top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            candidates.extend((float(scores[i]), entry.ids[i], document_id) for i in top)
+        candidates.sort(key=lambda c: -c[0])
+        return [{"id": cid, "document_id": doc_id, "score": score} for score, cid, doc_id in candidates[:k]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def warm(self, limit=VECTOR_CACHE_WARM_DOCS, days=VECTOR_CACHE_WARM_DAYS):
+        """Preload the documents with the most recent chat activity until the budget is full."""
+        from .models import ChatHistory
+
+        recent = (
+            ChatHistory.objects.filter(created_at__gte=timezone.now() - timedelta(days=days), document__isnull=False)
+            .values("document", "document__version")
+            .annotate(last_asked=Max("created_at"))
+            .order_by("-last_asked")[:limit]
+        )
+        loaded = 0
+        for row in recent:
+            if self._bytes >= self.max_bytes:
+                break
+            self.get(row["document"], row["document__version"])
+            loaded += 1
+        return loaded
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_vector_cache():
+    """Return the process-wide cache, or None when VECTOR_CACHE_MB=0."""
+    global _cache
+    if not VECTOR_CACHE_MB:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DocumentVectorCache()
+    return _cache
+
+
+def invalidate(document_ids):
+    cache = get_vector_cache()
+    if cache is not None:
+        for document_id in document_ids:
+            cache.invalidate(document_id)
+
+
+def warm_in_background():
+    """Warm the cache on a daemon thread (called by the ASGI start-up hook in ``backend.asgi``)."""
+    from .vector_store import VECTOR_INDEX
+
+    cache = get_vector_cache()
+    if cache is None or VECTOR_INDEX == "quantized":
+        return  # the quantized index answers every query; nothing reads this cache
+
+    def run():
+        from django.db import connections
+
+        try:
+            loaded = cache.warm()
+            stats = cache.stats()
+            print(f"🔥 Vector cache warmed: {loaded} documents, {stats['bytes'] / 2**20:.1f} MiB")
+        except Exception as e:
+            print(f"⚠️ Vector cache warm-up failed: {e}")
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name="vector-cache-warm", daemon=True).start()
@@ -1,17 +1,177 @@
+"""Single long-lived Chroma collection shared by every document.
+
+Each chunk carries ``document_id`` and ``owner_id`` metadata; queries are
+scoped with a metadata filter instead of opening one store per document.
+Document-scoped queries are answered from the in-memory cache of hot
+documents' vectors (``api.vector_cache``).
+
+With ``VECTOR_INDEX=quantized`` the memory-mapped int8 index
+(``api.quantized_index``) replaces Chroma as the vector store: vectors are
+written and searched there only, and chunk text and positions live in the
+``Chunk`` table. Switch an existing deployment with
+``manage.py build_quantized_index --drop-chroma``.
+"""
 import os
-from chromadb.config import Settings
+import threading
+from pathlib import Path
+
 import chromadb
 
+from . import vector_cache
+
 CHROMA_DIR = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION", "documents")
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "chroma")  # "chroma" | "quantized"
+# Where the old one-store-per-document layout lived (db/doc_<id>)
+LEGACY_DB_DIR = Path("db")
+
+_client = None
+_collections = {}
+_lock = threading.RLock()
+
 
 def get_client():
-    settings = Settings(chroma_db_impl="duckdb+parquet", persist_directory=CHROMA_DIR)
-    client = chromadb.Client(settings=settings)
-    return client
-
-def get_collection(name="documents"):
-    client = get_client()
-    try:
-        return client.get_collection(name)
-    except Exception:
-        return client.create_collection(name=name)
+    """Return the process-wide persistent Chroma client."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = chromadb.PersistentClient(path=CHROMA_DIR)
+    return _client
+
+
+def get_collection(name=COLLECTION_NAME):
+    if name not in _collections:
+        with _lock:
+            if name not in _collections:
+                _collections[name] = get_client().get_or_create_collection(
+                    name, metadata={"hnsw:space": "cosine"}
+                )
+    return _collections[name]
+
+
+def chunk_id(document_id, key):
+    """Chroma id for a chunk; ``key`` is its content hash (or position for legacy stores)."""
+    return f"{document_id}-{key}"
+
+
+def chunk_metadata(document_id, owner_id, index):
+    return {"document_id": document_id, "owner_id": owner_id, "chunk": index}
+
+
+def add_chunks(document, chunks, vectors):
+    """Upsert chunks ``{"id", "text", "position"}`` with their pre-computed vectors."""
+    if not chunks:
+        return
+    if VECTOR_INDEX == "quantized":
+        _quantized().add(document.id, document.owner_id, [c["id"] for c in chunks], vectors)
+        return
+    get_collection().upsert(
+        ids=[c["id"] for c in chunks],
+        embeddings=vectors,
+        documents=[c["text"] for c in chunks],
+        metadatas=[chunk_metadata(document.id, document.owner_id, c["position"]) for c in chunks],
+    )
+    vector_cache.invalidate([document.id])
+
+
+def update_positions(document, chunks):
+    """Refresh the stored position of chunks that were kept across a re-index (no re-embedding)."""
+    if not chunks or VECTOR_INDEX == "quantized":  # positions only live in the Chunk table there
+        return
+    get_collection().update(
+        ids=[c["id"] for c in chunks],
+        metadatas=[chunk_metadata(document.id, document.owner_id, c["position"]) for c in chunks],
+    )
+
+
+def document_chunk_ids(document_id):
+    if VECTOR_INDEX == "quantized":
+        return _quantized().document_chunk_ids(document_id)
+    return get_collection().get(where={"document_id": document_id}, include=[])["ids"]
+
+
+def iter_chunk_ids(batch_size=1000):
+    """Yield ``(chunk id, document id)`` for every stored vector."""
+    if VECTOR_INDEX == "quantized":
+        yield from _quantized().live_chunks()
+        return
+    collection = get_collection()
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        batch = collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+        for cid, meta in zip(batch["ids"], batch["metadatas"]):
+            yield cid, meta.get("document_id")
+
+
+def delete_chunks(ids):
+    if not ids:
+        return
+    if VECTOR_INDEX == "quantized":
+        _quantized().delete_chunks(ids)
+        return
+    get_collection().delete(ids=list(ids))
+    vector_cache.invalidate({int(cid.split("-", 1)[0]) for cid in ids})
+
+
+def delete_document(document_id):
+    if VECTOR_INDEX == "quantized":
+        _quantized().delete_document(document_id)
+        return
+    get_collection().delete(where={"document_id": document_id})
+    vector_cache.invalidate([document_id])
+
+
+def _quantized():
+    from .quantized_index import get_quantized_index
+
+    return get_quantized_index()
+
+
+def build_filter(owner_id, document_ids=None):
+    clauses = [{"owner_id": owner_id}]
+    if document_ids:
+        ids = [int(d) for d in document_ids]
+        clauses.append({"document_id": ids[0]} if len(ids) == 1 else {"document_id": {"$in": ids}})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _similarity(collection, distance):
+    # chroma distances: cosine → 1 - cos, l2 → squared euclidean (unit vectors: 2 - 2cos)
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    return 1.0 - distance if space == "cosine" else 1.0 - distance / 2.0
+
+
+def query(embedding, owner_id, document_ids=None, k=3):
+    """Return the top-k chunk ids and scores for ``embedding`` within the owner's documents."""
+    if VECTOR_INDEX == "quantized":
+        return _quantized().search(embedding, owner_id, document_ids, k)
+    cache = vector_cache.get_vector_cache()
+    if cache is not None and document_ids and len(document_ids) <= vector_cache.VECTOR_CACHE_MAX_QUERY_DOCS:
+        return cache.search(embedding, owner_id, [int(d) for d in document_ids], k)
+    collection = get_collection()
+    result = collection.query(
+        query_embeddings=[embedding],
+        n_results=k,
+        where=build_filter(owner_id, document_ids),
+        include=["metadatas", "distances"],
+    )
+    return [
+        {
+            "id": cid,
+            "document_id": meta.get("document_id"),
+            "score": _similarity(collection, dist),
+        }
+        for cid, meta, dist in zip(result["ids"][0], result["metadatas"][0], result["distances"][0])
+    ]
+
+
+def get_chunks(ids):
+    """Return {id: {"document_id", "text"}} for the given chunk ids."""
+    if not ids:
+        return {}
+    result = get_collection().get(ids=list(ids), include=["documents", "metadatas"])
+    return {
+        cid: {"document_id": meta.get("document_id"), "text": text}
+        for cid, text, meta in zip(result["ids"], result["documents"], result["metadatas"])
+    }
@@ -1,10 +1,17 @@
+import asyncio
 import os
-from pathlib import Path
-import pdfplumber
-from pdf2image import convert_from_path
-import pytesseract
-
+import json
+
+from django.db.models.functions import Substr
+from django.http import JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import filesizeformat
 from rest_framework import status, permissions, viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -12,15 +19,26 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from .models import Document, ChatHistory
+from .models import Document, Chunk, ChatHistory, IngestionJob
 from .serializers import (
+    ChunkSerializer,
+    DocumentListSerializer,
     DocumentSerializer,
-    ChatHistorySerializer,
+    IngestionJobSerializer,
     UserSerializer,
     RegisterSerializer,
 )
-from .rag_utils import get_chroma_vstore, generate_answer, index_document
-from rest_framework.decorators import api_view
+from .rag_utils import build_prompt
+from .retrieval import embed_query, needs_query_embedding, retrieve
+from .context import CONTEXT_CANDIDATES, assemble_context
+from .answer_cache import answer_cache
+from .embeddings import get_embedding_service
+from .ingestion import enqueue_batch, enqueue_ingestion
+from .uploads import delete_from_storage, iter_archive, save_to_storage, upload_too_large
+from .gemini_wrapper import StreamInterrupted, agenerate_answer, astream_answer, generate_answer
+from .async_utils import AsyncAPIView, run_blocking
+from .telemetry import span
+from .pagination import ChunkCursorPagination, DocumentCursorPagination, keyset_page
 from rest_framework.response import Response
 from rest_framework import status
 from .models import ChatHistory
@@ -72,144 +90,555 @@ class LoginView(APIView):
 # ===============================
 # 📄 UPLOAD DOCUMENT
 # ===============================
+def upload_limit_response():
+    return Response(
+        {"error": f"File exceeds the {filesizeformat(settings.UPLOAD_MAX_BYTES)} upload limit"},
+        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    )
+
+
 class UploadDocumentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
+        with span("upload.receive"):  # streams the body to disk while hashing it
+            too_large = upload_too_large(request)
+        if too_large:
+            return upload_limit_response()
         f = request.FILES.get("file")
         if not f:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
 
         title = request.data.get("title") or f.name
-        doc = Document.objects.create(file=f, title=title, owner=request.user)
-        text = ""
+        with span("upload.save", size=f.size):
+            doc = Document.objects.create(file=f, title=title, owner=request.user)
+        with span("upload.enqueue", document_id=doc.id):
+            job = enqueue_ingestion(doc, file_hash=getattr(f, "sha256", None))
 
-        try:
-            text = index_document(doc, doc.file.path)
-        except Exception as e:
-            print("⚠️ RAG index error:", e)
+        return Response(
+            {
+                "document_id": doc.id,
+                "job_id": job.id,
+                "document": DocumentSerializer(doc).data,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
 
-        # Fallback 1️⃣: PyPDF2 extraction
-        if not text:
-            try:
-                from PyPDF2 import PdfReader
-                reader = PdfReader(doc.file.path)
-                for page in reader.pages:
-                    text += page.extract_text() or ""
-            except Exception as e:
-                print("⚠️ PDF extract error:", e)
-
-        # Fallback 2️⃣: OCR (for scanned PDFs)
-        if not text.strip():
+
+BATCH_UPLOAD_MAX_FILES = 1000
+
+
+class BatchUploadView(APIView):
+    """Upload many files (repeated ``files`` fields and/or a zip ``archive``) as one ingestion batch."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        with span("upload.receive"):
+            too_large = upload_too_large(request, settings.BATCH_UPLOAD_MAX_BYTES)
+        if too_large:
+            return upload_limit_response()
+        files = request.FILES.getlist("files")
+        archive = request.FILES.get("archive")
+        if not files and not archive:
+            return Response({"error": "No files uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(files) > BATCH_UPLOAD_MAX_FILES:
+            return Response({"error": f"At most {BATCH_UPLOAD_MAX_FILES} files per batch"}, status=400)
+        members = ()
+        if archive:
             try:
-                print("🧠 Running OCR extraction...")
-                images = convert_from_path(doc.file.path)
-                for image in images:
-                    text += pytesseract.image_to_string(image)
-            except Exception as e:
-                print("⚠️ OCR extract error:", e)
+                members = iter_archive(archive, BATCH_UPLOAD_MAX_FILES - len(files))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Files go to storage before the transaction, so the write lock is only
+        # held for the inserts; anything stored is removed again on failure.
+        field = Document._meta.get_field("file")
+        stored, skipped = [], []  # (title, stored name, sha256)
+        try:
+            with span("upload.save", files=len(files)):
+                for f in files:
+                    stored.append((f.name, save_to_storage(field, f, f.name), getattr(f, "sha256", None)))
+                for name, member, error in members:
+                    if error:
+                        skipped.append({"name": name, "error": error})
+                        continue
+                    stored.append((name, save_to_storage(field, member, name), None))
+            with span("upload.enqueue", documents=len(stored)), transaction.atomic():
+                documents = Document.objects.bulk_create(
+                    Document(owner=request.user, title=title, file=path) for title, path, _ in stored
+                )
+                file_hashes = {doc.id: sha256 for doc, (_, _, sha256) in zip(documents, stored)}
+                batch, jobs = enqueue_batch(documents, file_hashes)
+        except Exception:
+            delete_from_storage(field, [path for _, path, _ in stored])
+            raise
+
+        return Response(
+            {
+                "batch": batch,
+                "jobs": [
+                    {"document_id": doc.id, "job_id": job.id, "title": doc.title} for doc, job in zip(documents, jobs)
+                ],
+                "skipped": skipped,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
 
-        doc.text = text
-        doc.save()
 
-        serializer = DocumentSerializer(doc)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+class IngestionJobView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        try:
+            job = IngestionJob.objects.get(id=job_id, document__owner=request.user)
+        except IngestionJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=404)
+        return Response(IngestionJobSerializer(job).data)
+
+
+class IngestionBatchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, batch):
+        jobs = IngestionJob.objects.filter(batch=batch, document__owner=request.user).order_by("id")
+        if not jobs:
+            return Response({"error": "Batch not found"}, status=404)
+        counts = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return Response({"batch": batch, "status": counts, "jobs": IngestionJobSerializer(jobs, many=True).data})
 
 
 # ===============================
 # 📚 DOCUMENT VIEWSET
 # ===============================
 class DocumentViewSet(viewsets.ModelViewSet):
+    """Documents never load their full text here; chunks are a paginated sub-resource."""
     serializer_class = DocumentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DocumentCursorPagination
 
     def get_queryset(self):
-        return Document.objects.filter(owner=self.request.user)
+        queryset = Document.objects.filter(owner=self.request.user)
+        if self.action == "list":
+            return queryset.only("id", "title", "version", "created_at")
+        return queryset.defer("text").annotate(chunk_count=Count("chunks"))
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return DocumentListSerializer
+        return DocumentSerializer
+
+    def update(self, request, *args, **kwargs):
+        if upload_too_large(request):
+            return upload_limit_response()
+        return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        old_file = serializer.instance.file.name
+        document = serializer.save()
+        if "file" in serializer.validated_data:
+            if old_file and old_file != document.file.name:
+                document.file.storage.delete(old_file)
+            # unchanged chunks keep their vectors; only the diff is embedded
+            enqueue_ingestion(document, file_hash=getattr(serializer.validated_data["file"], "sha256", None))
+
+    @action(detail=True, methods=["post"])
+    def reindex(self, request, pk=None):
+        document = get_object_or_404(Document.objects.defer("text"), id=pk, owner=request.user)
+        job = enqueue_ingestion(document, force=True)
+        return Response({"document_id": document.id, "job_id": job.id}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["get"])
+    def chunks(self, request, pk=None):
+        document = get_object_or_404(Document.objects.only("id"), id=pk, owner=request.user)
+        paginator = ChunkCursorPagination()
+        page = paginator.paginate_queryset(Chunk.objects.filter(document=document), request, view=self)
+        return paginator.get_paginated_response(ChunkSerializer(page, many=True).data)
 
 
 # ===============================
 # 💬 ASK QUESTION (RAG)
 # ===============================
-# ===============================
-# 💬 ASK QUESTION (RAG)
-# ===============================
-class AskQuestionView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
-
-    def post(self, request):
-        question = request.data.get("question")
-        doc_id = request.data.get("document_id")
+FALLBACK_CONTEXT_CHARS = 1500
+
+
+def fallback_context(document):
+    """The start of the document, read from its first chunk rows (or the text column)."""
+    parts, size = [], 0
+    for text in Chunk.objects.filter(document=document).order_by("position").values_list("text", flat=True):
+        parts.append(text)
+        size += len(text)
+        if size >= FALLBACK_CONTEXT_CHARS:
+            break
+    if parts:
+        return "\n".join(parts)[:FALLBACK_CONTEXT_CHARS]
+    head = (
+        Document.objects.filter(id=document.id)
+        .annotate(head=Substr("text", 1, FALLBACK_CONTEXT_CHARS))
+        .values_list("head", flat=True)
+        .first()
+    )
+    return head or ""
+
+
+def build_context(document, question, embedding=None, timings=None):
+    """Top chunks for the question packed into the context budget, falling back to the start of the document."""
+    context = ""
+    try:
+        results = retrieve(
+            question, document.owner_id, [document.id], k=CONTEXT_CANDIDATES, embedding=embedding, timings=timings
+        )
+        with span("ask.pack", timings):
+            context, _ = assemble_context(results)
+    except Exception as e:
+        print("⚠️ Vector search error:", e)
+
+    if not context.strip():
+        print("⚠️ Using fallback: first chunks for context")
+        context = fallback_context(document)
+    return context
+
+
+async def lookup_cached_answer(document, question):
+    """Check the answer cache; returns (answer, cache_kind, question_embedding).
+
+    The exact tier is checked before embedding; on a miss the embedding is
+    returned so retrieval can reuse it. Keyword queries aren't embedded here,
+    so retrieval can serve them from BM25 alone.
+    """
+    answer, kind = answer_cache.get(document.id, document.version, question)
+    if answer is not None or not needs_query_embedding(question):
+        return answer, kind, None
+    with span("ask.embed"):
+        embedding = await run_blocking(embed_query, question)
+    answer, kind = answer_cache.get(document.id, document.version, question, embedding)
+    return answer, kind, embedding
+
+
+class AskQuestionView(AsyncAPIView):
+    async def post(self, request):
+        data = self.parse_json(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+        question = data.get("question")
+        doc_id = data.get("document_id")
 
         if not question or not doc_id:
-            return Response({"error": "Missing document_id or question"}, status=400)
+            return JsonResponse({"error": "Missing document_id or question"}, status=400)
 
-        try:
-            document = Document.objects.get(id=doc_id, owner=request.user)
-        except Document.DoesNotExist:
-            return Response({"error": "Document not found or access denied"}, status=404)
+        document = await Document.objects.filter(id=doc_id, owner=request.user).defer("text").afirst()
+        if document is None:
+            return JsonResponse({"error": "Document not found or access denied"}, status=404)
 
-        # 🧩 Prevent NoneType errors
-        if not document.text:
-            document.text = ""
-        context = ""
-
-        try:
-            doc_vector_path = Path(f"db/doc_{document.id}")
-            vstore = get_chroma_vstore(str(doc_vector_path))
-            results = vstore.similarity_search(question, k=3)
-            context = "\n".join([r.page_content for r in results]) if results else ""
-        except Exception as e:
-            print("⚠️ Vector search error:", e)
-            context = (document.text or "")[:1500]
-
-        if not context.strip():
-            print("⚠️ Using fallback: document.text for context")
-            context = (document.text or "")[:1500]
+        timings = {}
+        with span("ask.cache_lookup", timings):
+            answer, cache_kind, embedding = await lookup_cached_answer(document, question)
+        if answer is not None:
+            await ChatHistory.objects.acreate(document=document, question=question, answer=answer)
+            return JsonResponse({"answer": answer, "cached": True, "cache": cache_kind})
 
+        with span("ask.context", timings):
+            context = await run_blocking(build_context, document, question, embedding, timings)
         if not context.strip():
-            return Response(
+            return JsonResponse(
                 {"error": "Document has no readable text to answer from."},
                 status=400,
             )
 
-        prompt = f"""
-You are an intelligent document assistant.
-Use only the context below to answer the question.
+        with span("ask.prompt", timings):
+            prompt = build_prompt(question, context)
+
+        with span("ask.generate", timings):
+            answer = await agenerate_answer(prompt)
+        answer_cache.put(document.id, document.version, question, answer, embedding)
+
+        with span("ask.history_write", timings):
+            await ChatHistory.objects.acreate(document=document, question=question, answer=answer)
+
+        return JsonResponse({"answer": answer, "cached": False, "timings": timings}, status=status.HTTP_200_OK)
+
+
+# ===============================
+# 📦 BATCH ASK
+# ===============================
+BATCH_ASK_MAX_QUESTIONS = 200
+BATCH_ASK_CONCURRENCY = int(os.getenv("BATCH_ASK_CONCURRENCY", "8"))
+
+
+class BatchAskView(AsyncAPIView):
+    """Answer many questions about one document.
+
+    Cache misses are embedded in one vectorized call; retrieval and
+    generation then run at most ``BATCH_ASK_CONCURRENCY`` at a time.
+    Results come back in question order; a question that fails gets an
+    ``error`` entry instead of failing the batch.
+    """
+
+    async def post(self, request):
+        data = self.parse_json(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+        questions = data.get("questions")
+        doc_id = data.get("document_id")
+        if not doc_id or not isinstance(questions, list) or not questions:
+            return JsonResponse({"error": "Missing document_id or questions"}, status=400)
+        if not all(isinstance(q, str) and q.strip() for q in questions):
+            return JsonResponse({"error": "questions must be non-empty strings"}, status=400)
+        if len(questions) > BATCH_ASK_MAX_QUESTIONS:
+            return JsonResponse({"error": f"At most {BATCH_ASK_MAX_QUESTIONS} questions per batch"}, status=400)
+
+        document = await Document.objects.filter(id=doc_id, owner=request.user).defer("text").afirst()
+        if document is None:
+            return JsonResponse({"error": "Document not found or access denied"}, status=404)
+
+        results = [None] * len(questions)
+
+        def cached(i, embedding=None):
+            answer, kind = answer_cache.get(document.id, document.version, questions[i], embedding)
+            if answer is not None:
+                results[i] = {"question": questions[i], "answer": answer, "cached": True, "cache": kind}
+            return answer is not None
+
+        misses = [i for i in range(len(questions)) if not cached(i)]
+        to_embed = [i for i in misses if needs_query_embedding(questions[i])]
+        embeddings = {}
+        if to_embed:
+            with span("ask.embed", questions=len(to_embed)):
+                vectors = await run_blocking(get_embedding_service().encode, [questions[i] for i in to_embed])
+            embeddings = dict(zip(to_embed, vectors))
+            misses = [i for i in misses if i not in embeddings or not cached(i, embeddings[i])]
+
+        gate = asyncio.Semaphore(BATCH_ASK_CONCURRENCY)
+
+        async def answer(i):
+            question = questions[i]
+            async with gate:
+                context = await run_blocking(build_context, document, question, embeddings.get(i))
+                if not context.strip():
+                    results[i] = {"question": question, "error": "Document has no readable text to answer from."}
+                    return
+                with span("ask.generate"):
+                    text = await agenerate_answer(build_prompt(question, context))
+            answer_cache.put(document.id, document.version, question, text, embeddings.get(i))
+            results[i] = {"question": question, "answer": text, "cached": False}
+
+        # one failed question must not discard the answers already generated for the others
+        outcomes = await asyncio.gather(*(answer(i) for i in misses), return_exceptions=True)
+        for i, outcome in zip(misses, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"⚠️ Batch ask failed for doc {document.id}, question {i}: {outcome!r}")
+                results[i] = {"question": questions[i], "error": "Could not answer this question. Please try again."}
+
+        with span("ask.history_write", rows=len(results)):
+            await ChatHistory.objects.abulk_create(
+                [ChatHistory(document=document, question=r["question"], answer=r["answer"]) for r in results
+                 if "answer" in r]
+            )
+        return JsonResponse({"document_id": document.id, "results": results}, status=status.HTTP_200_OK)
+
+
+# ===============================
+# 📡 ASK QUESTION — STREAMING (SSE)
+# ===============================
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
-Context:
-{context}
 
-Question:
-{question}
+class AskStreamView(AsyncAPIView):
+    """Stream the answer as Server-Sent Events, then save it to ChatHistory.
 
-Answer:
-"""
+    Emits ``data: {"token": ...}`` events while Gemini generates and a final
+    ``event: done`` carrying the assembled answer, or ``event: error`` (with
+    ``"truncated": true``) if generation broke off mid-answer. Needs the ASGI
+    server.
+    """
 
-        answer = generate_answer(prompt, context)
+    async def post(self, request):
+        data = self.parse_json(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
 
-        ChatHistory.objects.create(document=document, question=question, answer=answer)
+        question = data.get("question")
+        doc_id = data.get("document_id")
+        if not question or not doc_id:
+            return JsonResponse({"error": "Missing document_id or question"}, status=400)
+
+        document = await Document.objects.filter(id=doc_id, owner=request.user).defer("text").afirst()
+        if document is None:
+            return JsonResponse({"error": "Document not found or access denied"}, status=404)
+
+        cached, cache_kind, embedding = await lookup_cached_answer(document, question)
+        if cached is None:
+            context = await run_blocking(build_context, document, question, embedding)
+            if not context.strip():
+                return JsonResponse({"error": "Document has no readable text to answer from."}, status=400)
+            prompt = build_prompt(question, context)
+
+        async def events():
+            if cached is not None:
+                answer = cached
+                yield sse_event({"token": cached})
+            else:
+                parts = []
+                try:
+                    async for token in astream_answer(prompt):
+                        parts.append(token)
+                        yield sse_event({"token": token})
+                except StreamInterrupted as e:
+                    # a truncated answer is neither cached nor saved
+                    print(f"⚠️ Stream interrupted for doc {document.id}: {e}")
+                    yield sse_event(
+                        {"error": "The answer was interrupted. Please try again.", "truncated": True},
+                        event="error",
+                    )
+                    return
+                answer = "".join(parts).strip()
+                answer_cache.put(document.id, document.version, question, answer, embedding)
+
+            chat = await ChatHistory.objects.acreate(document=document, question=question, answer=answer)
+            yield sse_event(
+                {"answer": answer, "chat_id": chat.id, "cached": cached is not None, "cache": cache_kind},
+                event="done",
+            )
 
-        return Response({"answer": answer}, status=status.HTTP_200_OK)
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
 
 
 # ===============================
-# 🕘 CHAT HISTORY
+# 📚 ASK ACROSS LIBRARY (RAG)
 # ===============================
-class ChatHistoryView(APIView):
+class LibraryAskView(APIView):
+    """Answer a question from all of the user's documents (or a chosen subset)."""
     permission_classes = [permissions.IsAuthenticated]
+    MAX_K = 20
 
-    def get(self, request, document_id):
-        chats = ChatHistory.objects.filter(
-            document__id=document_id, document__owner=request.user
-        ).order_by("-created_at")
-        return Response(ChatHistorySerializer(chats, many=True).data)
+    def post(self, request):
+        question = request.data.get("question")
+        doc_ids = request.data.get("document_ids") or None
+        if not question:
+            return Response({"error": "Missing question"}, status=400)
+        try:
+            if doc_ids is not None:
+                doc_ids = [int(d) for d in doc_ids]
+            k = int(request.data.get("k", 5))
+        except (TypeError, ValueError):
+            return Response({"error": "document_ids must be a list of ids and k an integer"}, status=400)
+        if k < 1:
+            return Response({"error": "k must be at least 1"}, status=400)
+        k = min(k, self.MAX_K)
+
+        try:
+            results = retrieve(question, request.user.id, doc_ids, k=k)
+        except Exception as e:
+            print("⚠️ Vector search error:", e)
+            return Response({"error": "Search failed"}, status=502)
 
+        if not results:
+            return Response({"error": "No matching content in your documents."}, status=404)
 
-@api_view(['DELETE'])
-def delete_chat(request, chat_id):
-    try:
-        chat = ChatHistory.objects.get(id=chat_id)
-        chat.delete()
-        return Response({"message": "Chat deleted successfully."}, status=status.HTTP_200_OK)
-    except ChatHistory.DoesNotExist:
-        return Response({"error": "Chat not found."}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        titles = dict(
+            Document.objects.filter(
+                owner=request.user, id__in={r["document_id"] for r in results}
+            ).values_list("id", "title")
+        )
+        context, _ = assemble_context(results, labels=titles)
+        answer = generate_answer(build_prompt(question, context))
+
+        sources = {}
+        for r in results:
+            best = sources.get(r["document_id"])
+            if best is None or r["score"] > best["score"]:
+                sources[r["document_id"]] = {
+                    "document_id": r["document_id"],
+                    "title": titles.get(r["document_id"]),
+                    "score": round(r["score"], 4),
+                }
+        return Response(
+            {"answer": answer, "sources": sorted(sources.values(), key=lambda s: -s["score"])},
+            status=status.HTTP_200_OK,
+        )
+
+
+# ===============================
+# 🕘 CHAT HISTORY
+# ===============================
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+SUMMARY_ANSWER_CHARS = 200
+BULK_DELETE_MAX = 1000
+
+
+def history_page(document_id, owner, cursor=None, limit=HISTORY_PAGE_SIZE, summary=False):
+    """One newest-first page of a document's chats; summary mode truncates answers in the DB."""
+    chats = ChatHistory.objects.filter(document_id=document_id, document__owner=owner)
+    if summary:
+        chats = chats.annotate(answer_preview=Substr("answer", 1, SUMMARY_ANSWER_CHARS))
+        fields = ("id", "document", "question", "answer_preview", "created_at")
+    else:
+        fields = ("id", "document", "question", "answer", "created_at")
+    rows, next_cursor = keyset_page(chats.values(*fields), cursor, limit)
+    if summary:
+        for row in rows:
+            row["answer"] = row.pop("answer_preview")
+            row["truncated"] = len(row["answer"]) >= SUMMARY_ANSWER_CHARS
+    return rows, next_cursor
+
+
+class ChatHistoryView(AsyncAPIView):
+    """GET pages through a document's chats (``?cursor=&limit=&summary=1``); DELETE clears them."""
+
+    async def get(self, request, document_id):
+        try:
+            limit = min(int(request.GET.get("limit", HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+            rows, next_cursor = await sync_to_async(history_page)(
+                document_id,
+                request.user,
+                cursor=request.GET.get("cursor"),
+                limit=max(limit, 1),
+                summary=request.GET.get("summary") in ("1", "true"),
+            )
+        except ValueError:
+            return JsonResponse({"error": "Invalid cursor or limit"}, status=400)
+        return JsonResponse({"results": rows, "next": next_cursor})
+
+    async def delete(self, request, document_id):
+        deleted, _ = await ChatHistory.objects.filter(
+            document_id=document_id, document__owner=request.user
+        ).adelete()
+        return JsonResponse({"deleted": deleted}, status=status.HTTP_200_OK)
+
+
+class ChatDeleteView(AsyncAPIView):
+    async def delete(self, request, chat_id):
+        deleted, _ = await ChatHistory.objects.filter(
+            id=chat_id, document__owner=request.user
+        ).adelete()
+        if not deleted:
+            return JsonResponse({"error": "Chat not found."}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse({"message": "Chat deleted successfully."}, status=status.HTTP_200_OK)
+
+
+class ChatBulkDeleteView(AsyncAPIView):
+    """Delete many of the user's chats in one statement: ``{"ids": [...]}``."""
+
+    async def post(self, request):
+        data = self.parse_json(request)
+        ids = data.get("ids") if data else None
+        if not isinstance(ids, list) or not ids:
+            return JsonResponse({"error": "ids must be a non-empty list"}, status=400)
+        if len(ids) > BULK_DELETE_MAX:
+            return JsonResponse({"error": f"At most {BULK_DELETE_MAX} ids per request"}, status=400)
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "ids must be integers"}, status=400)
+
+        deleted, _ = await ChatHistory.objects.filter(id__in=ids, document__owner=request.user).adelete()
+        return JsonResponse({"deleted": deleted}, status=status.HTTP_200_OK)
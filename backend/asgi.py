@@ -2,6 +2,12 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Streaming endpoints (``/api/ask/stream/``) need it; serve with e.g.
+``uvicorn backend.asgi:application``.
+
+Django doesn't speak the ASGI lifespan protocol, so ``application`` answers
+it itself and runs the start-up hooks (warming ``api.vector_cache``) when
+the server sends ``lifespan.startup``, not when this module is imported.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +19,28 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+def on_startup():
+    # preload the vectors of recently active documents
+    from api.vector_cache import warm_in_background
+
+    warm_in_background()
+
+
+async def application(scope, receive, send):
+    if scope["type"] != "lifespan":
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                on_startup()
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+load_dotenv()
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.telemetry.TelemetryMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,13 +90,60 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# DB_ENGINE=sqlite (default, single node) or postgres (needs psycopg[pool]).
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+# Seconds a connection is reused across requests; 0 closes it after each request.
+# Keep 0 under ASGI (the default deployment): async views run their ORM calls on
+# per-request threads, so persistent connections pile up instead of being reused.
+# Django recommends the backend's pool there instead (DB_POOL=1 with Postgres).
+# Only raise it for a WSGI deployment.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "0"))
+
+# SQLite tuned for concurrent writers: WAL lets reads run alongside the single
+# writer, IMMEDIATE transactions take the write lock up front (waiting on
+# busy_timeout instead of failing with "database is locked" on upgrade) and
+# synchronous=NORMAL is durable under WAL except on power loss. WAL itself is
+# persistent and is switched on once by migration api.0011_sqlite_wal, not
+# per connection.
+SQLITE_OPTIONS = {
+    "timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "30")),
+    "transaction_mode": "IMMEDIATE",
+    "init_command": (
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA cache_size=-20000;"  # 20 MB page cache per connection
+        "PRAGMA mmap_size=268435456;"
+        "PRAGMA wal_autocheckpoint=1000"
+    ),
 }
 
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", "docassistant"),
+            'USER': os.getenv("DB_USER", "docassistant"),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", "localhost"),
+            'PORT': os.getenv("DB_PORT", "5432"),
+            # psycopg's pool (DB_POOL=1) suits ASGI; it replaces CONN_MAX_AGE, which must then be 0
+            'CONN_MAX_AGE': 0 if os.getenv("DB_POOL") == "1" else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {"pool": {"min_size": 2, "max_size": int(os.getenv("DB_POOL_SIZE", "20"))}}
+            if os.getenv("DB_POOL") == "1" else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': SQLITE_OPTIONS if os.getenv("SQLITE_TUNED", "1") == "1" else {},
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,10 +187,19 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
-import os
-from dotenv import load_dotenv
-load_dotenv()
-
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 CHROMA_DB_PATH = os.path.join(BASE_DIR, "chroma_db")
 
+
+# Background ingestion: jobs are queued in the database and run on an
+# in-process thread pool unless INGEST_INLINE=0 (then use `manage.py ingest_worker`).
+INGEST_INLINE = os.getenv("INGEST_INLINE", "1") == "1"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+# Uploads stream to disk (hashed on the fly) next to the media files, so saving
+# a Document renames the temp file into place instead of copying it.
+FILE_UPLOAD_HANDLERS = ["api.uploads.HashingUploadHandler"]
+UPLOAD_TEMP_DIR = os.getenv("UPLOAD_TEMP_DIR", "uploads_tmp")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "512")) * 1024 * 1024
+# whole-request cap for /api/upload/batch/ (each file is still held to UPLOAD_MAX_BYTES)
+BATCH_UPLOAD_MAX_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_MB", "4096")) * 1024 * 1024
@@ -17,7 +17,7 @@ export default function Dashboard() {
     const token = authService.getToken();
     if (!token) return;
     const res = await documentService.list(token);
-    if (res.data) setDocuments(res.data.documents);
+    if (res.data) setDocuments(res.data.results);
     else toast.error(res.error || "Error loading documents");
   };
 
@@ -29,7 +29,16 @@ export default function Dashboard() {
   const loadHistory = async (id) => {
     const token = authService.getToken();
     const res = await chatService.getHistory(id, token);
-    if (res.data) setMessages(res.data.messages);
+    if (res.data)
+      setMessages(
+        res.data.results
+          .slice()
+          .reverse()
+          .flatMap((c) => [
+            { id: `q${c.id}`, role: "user", content: c.question },
+            { id: `a${c.id}`, role: "assistant", content: c.answer },
+          ])
+      );
   };
 
   // Upload new document
@@ -37,12 +46,22 @@ export default function Dashboard() {
     const token = authService.getToken();
     const res = await documentService.upload(file, token);
     if (res.data) {
-      toast.success("Document uploaded!");
+      toast.success("Document uploaded! Indexing in the background...");
       await loadDocs();
       setSelectedDoc(res.data.document_id);
+      pollJob(res.data.job_id, token);
     } else toast.error(res.error || "Upload failed");
   };
 
+  // Poll the ingestion job until it finishes
+  const pollJob = async (jobId, token) => {
+    const res = await documentService.jobStatus(jobId, token);
+    if (!res.data) return;
+    if (res.data.status === "done") toast.success("Document indexed!");
+    else if (res.data.status === "failed") toast.error(res.data.error || "Indexing failed");
+    else setTimeout(() => pollJob(jobId, token), 2000);
+  };
+
   // Send message to backend
   const handleSend = async (text) => {
     if (!selectedDoc) return toast.error("Select a document first");
@@ -50,11 +69,21 @@ export default function Dashboard() {
     const userMsg = { role: "user", content: text };
     setMessages((m) => [...m, userMsg]);
     setLoading(true);
-    const res = await chatService.ask(selectedDoc, text, token);
+    let started = false;
+    const res = await chatService.askStream(selectedDoc, text, token, (piece) => {
+      if (!started) {
+        started = true;
+        setLoading(false);
+        setMessages((m) => [...m, { role: "assistant", content: piece }]);
+      } else {
+        setMessages((m) => [
+          ...m.slice(0, -1),
+          { ...m[m.length - 1], content: m[m.length - 1].content + piece },
+        ]);
+      }
+    });
     setLoading(false);
-    if (res.data?.answer) {
-      setMessages((m) => [...m, { role: "assistant", content: res.data.answer }]);
-    } else toast.error(res.error || "Error fetching answer");
+    if (res.error) toast.error(res.error || "Error fetching answer");
   };
 
   return (
@@ -52,12 +52,60 @@ export const documentService = {
   },
 
   list: (token) => apiRequest("/api/documents/", "GET", null, token),
+
+  jobStatus: (jobId, token) => apiRequest(`/api/jobs/${jobId}/`, "GET", null, token),
 };
 
 export const chatService = {
   ask: (documentId, question, token) =>
     apiRequest("/api/ask/", "POST", { document_id: documentId, question }, token),
 
+  // Stream the answer over SSE; onToken is called for every text piece as it arrives.
+  askStream: async (documentId, question, token, onToken) => {
+    try {
+      const res = await fetch(`${API_BASE}/api/ask/stream/`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json", Authorization: `Bearer ${token}` },
+        body: JSON.stringify({ document_id: documentId, question }),
+      });
+      if (!res.ok) {
+        const data = await res.json();
+        return { error: data.detail || data.error || "Something went wrong" };
+      }
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let answer = "";
+      let error = null;
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const event of events) {
+          const dataLine = event.split("\n").find((l) => l.startsWith("data: "));
+          if (!dataLine) continue;
+          const payload = JSON.parse(dataLine.slice(6));
+          if (event.startsWith("event: error")) {
+            error = payload.error || "The answer was interrupted";
+            continue;
+          }
+          if (payload.token) {
+            answer += payload.token;
+            onToken(payload.token);
+          }
+          if (payload.answer !== undefined) answer = payload.answer;
+        }
+      }
+      if (error) return { error, data: { answer, truncated: true } };
+      return { data: { answer } };
+    } catch (err) {
+      return { error: err.message || "Network error" };
+    }
+  },
+
   getHistory: (documentId, token) =>
     apiRequest(`/api/chats/${documentId}/`, "GET", null, token),
 };